@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""Replay a video or an image directory through the detector and time it
+
+Frames go through CartDetector.process_frame and add_to_cart exactly as
+on the cart. Firestore is never contacted (scans land in a throwaway local
+journal) and the LEDs are driven through the mock GPIO.
+
+    python benchmark.py cart_run.mp4
+    python benchmark.py frames/ --backend onnx --roi 0.2,0.1,0.8,1.0 --json onnx_roi.json
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png", "*.bmp")
+STAGES = ["decode", "preprocess", "inference", "postprocess", "track", "cart", "total"]
+PERCENTILES = [50, 90, 99]
+
+
+def read_frames(source, loops=1):
+    """Yield frames from a video file or a directory of images"""
+    if os.path.isdir(source):
+        paths = sorted(p for pattern in IMAGE_PATTERNS for p in glob.glob(os.path.join(source, pattern)))
+        if not paths:
+            raise SystemExit(f"❌ No images found in {source}")
+        for _ in range(loops):
+            for path in paths:
+                frame = cv2.imread(path)
+                if frame is not None:
+                    yield frame
+        return
+
+    for _ in range(loops):
+        cap = cv2.VideoCapture(source)
+        if not cap.isOpened():
+            raise SystemExit(f"❌ Could not open {source}")
+        try:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                yield frame
+        finally:
+            cap.release()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def summarize(samples):
+    """Latency statistics in milliseconds for a list of durations in seconds"""
+    if not samples:
+        return {"count": 0}
+    ms = np.asarray(samples) * 1000
+    summary = {"count": len(ms), "mean_ms": round(float(ms.mean()), 3)}
+    for p, value in zip(PERCENTILES, np.percentile(ms, PERCENTILES)):
+        summary[f"p{p}_ms"] = round(float(value), 3)
+    summary["max_ms"] = round(float(ms.max()), 3)
+    return summary
+
+
+def load_detector(args, journal_path):
+    """Create the cart detector with Firestore and GPIO stubbed out"""
+    import raspberry_pi_detect_products as cart_app
+    from cart_journal import CartJournal
+    from cart_writer import CartWriter
+    from inference import load_backend
+    from leds import LedController, MockGPIO
+    from motion import MotionGate
+    from product_classes import ClassTable
+    from roi import RoiSelector
+
+    # Importing the Pi script sets up its pins and LEDs; on a Pi, switch them
+    # off and release them so the benchmark only ever drives mock pins
+    cart_app.leds.stop()
+    cart_app.GPIO.cleanup()
+    leds = LedController(MockGPIO(), [cart_app.GREEN_LED, cart_app.BLUE_LED, cart_app.RED_LED])
+    leds.start()
+    detector = cart_app.LedCartDetector(leds)
+
+    # Scans are journalled locally; the sync thread is never started, so
+    # nothing is sent to Firestore. A fixed cart ID keeps .device_id untouched.
+    detector.cart_journal = CartJournal(journal_path, cart_id="benchmark")
+    detector.cart_writer = CartWriter(None, detector.cart_journal)
+
+    detector.model = load_backend(args.backend, args.weights)
+    if args.imgsz and detector.model.name == "ultralytics":
+        detector.model.imgsz = args.imgsz
+    detector.class_table = ClassTable(detector.model.names)
+    if args.every_frame:
+        detector.motion_gate = MotionGate(min_changed=0.0)
+    zone = tuple(float(v) for v in args.roi.split(",")) if args.roi else None
+    detector.roi_selector = RoiSelector(zone=zone or detector.roi_selector.zone,
+                                        adaptive=not args.no_adaptive)
+    return detector
+
+
+def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        detector = load_detector(args, os.path.join(tmp, "journal.db"))
+        model = detector.model
+        samples = {stage: [] for stage in STAGES}
+        frames = 0
+        added = 0
+
+        source = read_frames(args.source, args.loops)
+        started = None
+        while args.limit is None or frames < args.limit + args.warmup:
+            t0 = time.perf_counter()
+            frame = next(source, None)
+            if frame is None:
+                break
+            t1 = time.perf_counter()
+            inferred_before = detector.motion_gate.frames_inferred
+            frame, delta = detector.process_frame(frame, draw=args.draw)
+            t2 = time.perf_counter()
+            if delta:
+                detector.add_to_cart(delta)
+            t3 = time.perf_counter()
+
+            frames += 1
+            if frames == args.warmup + 1:
+                started = t0
+            if frames <= args.warmup:
+                continue
+
+            samples["decode"].append(t1 - t0)
+            detect_time = 0.0
+            if detector.motion_gate.frames_inferred > inferred_before:
+                for stage in ("preprocess", "inference", "postprocess"):
+                    samples[stage].append(model.timings[stage])
+                    detect_time += model.timings[stage]
+            samples["track"].append(max(0.0, t2 - t1 - detect_time))
+            if delta:
+                samples["cart"].append(t3 - t2)
+                added += sum(quantity for _, quantity in delta)
+            samples["total"].append(t3 - t0)
+
+        measured = frames - args.warmup
+        elapsed = time.perf_counter() - started if started else 0.0
+        detector.leds.stop()
+
+    if measured <= 0:
+        raise SystemExit(f"❌ Only {frames} frames read, need more than the {args.warmup} warm-up frames")
+
+    return {
+        "source": args.source,
+        "backend": model.name,
+        "model": getattr(model, "path", args.weights),
+        "imgsz": getattr(model, "imgsz", None),
+        "roi": list(detector.roi_selector.zone),
+        "adaptive_roi": detector.roi_selector.adaptive,
+        "motion_gate": not args.every_frame,
+        "draw": args.draw,
+        "frames": measured,
+        "warmup_frames": args.warmup,
+        "frames_inferred": len(samples["inference"]),
+        "items_added": added,
+        "wall_time_s": round(elapsed, 3),
+        "fps": round(measured / elapsed, 2) if elapsed else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "stages": {stage: summarize(samples[stage]) for stage in STAGES},
+        "host": {"platform": platform.platform(), "python": platform.python_version(),
+                 "cpus": os.cpu_count()},
+    }
+
+
+def print_report(report):
+    print(f"📊 {report['frames']} frames from {report['source']} with {report['backend']} "
+          f"({report['frames_inferred']} inferred): {report['fps']} fps, "
+          f"peak RSS {report['peak_rss_mb']} MB, {report['items_added']} items added")
+    print(f"   {'stage':<12}{'count':>7}{'mean':>10}" + "".join(f"{'p' + str(p):>10}" for p in PERCENTILES) + f"{'max':>10}")
+    for stage, stats in report["stages"].items():
+        if not stats["count"]:
+            continue
+        print(f"   {stage:<12}{stats['count']:>7}{stats['mean_ms']:>10.2f}"
+              + "".join(f"{stats[f'p{p}_ms']:>10.2f}" for p in PERCENTILES)
+              + f"{stats['max_ms']:>10.2f}")
+
+
+def main():
+    from inference import DETECTOR_BACKEND, WEIGHTS
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="video file or directory of images")
+    parser.add_argument("--backend", default=DETECTOR_BACKEND, choices=["auto", "onnx", "ultralytics"])
+    parser.add_argument("--weights", default=WEIGHTS)
+    parser.add_argument("--imgsz", type=int, help="inference size for the ultralytics backend")
+    parser.add_argument("--roi", metavar="X1,Y1,X2,Y2", help="drop zone as fractions of the frame")
+    parser.add_argument("--no-adaptive", action="store_true", help="do not grow the ROI around tracks")
+    parser.add_argument("--every-frame", action="store_true", help="disable the motion gate")
+    parser.add_argument("--draw", action="store_true", help="include drawing the overlay")
+    parser.add_argument("--warmup", type=int, default=10, help="frames excluded from the results")
+    parser.add_argument("--limit", type=int, help="stop after this many measured frames")
+    parser.add_argument("--loops", type=int, default=1, help="replay the source this many times")
+    parser.add_argument("--json", default="benchmark.json", help="where to write the results")
+    args = parser.parse_args()
+
+    report = run(args)
+    print_report(report)
+    with open(args.json, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
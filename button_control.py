@@ -1,46 +1,176 @@
 #!/usr/bin/env python3
-import RPi.GPIO as GPIO
 import subprocess
+import threading
 import time
 import os
+from control import send_command, NOT_RUNNING
+from leds import load_gpio
 
 # Configuration
 BUTTON_PIN = 2        # Using GPIO2 (Physical Pin 3)
+# Starts detector_service.py; only used if the service is not running yet
 SCRIPT = "/home/rahul/run_cart_system.sh"
-DEBOUNCE_TIME = 0.3    # Seconds
+DEBOUNCE_TIME = 0.05   # Seconds the level must hold before it counts
+LONG_PRESS_TIME = 1.5  # Seconds held before a press counts as long
+BOOT_DELAY = 5         # Seconds to wait for the system to boot before arming
+
+SHORT_PRESS = "short"
+LONG_PRESS = "long"
+
+
+class Debouncer:
+    """Debounce a button from edge timestamps alone
+
+    `edge()` records the raw level and when it changed; nothing waits. The
+    level only counts once it has held for `settle` seconds, which
+    `poll(now)` checks. A press released before `long_press` seconds is
+    reported as SHORT_PRESS on release. A press held that long is reported
+    as LONG_PRESS while it is still held, and its release is ignored.
+    `next_deadline()` tells the caller when to poll next.
+    """
+
+    def __init__(self, settle=DEBOUNCE_TIME, long_press=LONG_PRESS_TIME, pressed_level=0):
+        self.settle = settle
+        self.long_press = long_press
+        self.pressed_level = pressed_level
+        self.raw = self.stable = 1 - pressed_level
+        self.last_edge = float("-inf")
+        self.pressed_at = None
+        self.long_reported = False
+
+    @property
+    def pressed(self):
+        return self.stable == self.pressed_level
+
+    def edge(self, level, timestamp):
+        if level != self.raw:
+            self.raw = level
+            self.last_edge = timestamp
+
+    def next_deadline(self):
+        """Time of the next state change to poll for, or None if idle"""
+        deadlines = []
+        if self.raw != self.stable:
+            deadlines.append(self.last_edge + self.settle)
+        if self.pressed and not self.long_reported:
+            deadlines.append(self.pressed_at + self.long_press)
+        return min(deadlines) if deadlines else None
+
+    def poll(self, now):
+        """Apply everything due by `now` and return the presses it completed"""
+        events = []
+        if self.raw != self.stable and now >= self.last_edge + self.settle:
+            self.stable = self.raw
+            if self.pressed:
+                self.pressed_at = self.last_edge
+                self.long_reported = False
+            elif not self.long_reported:
+                events.append(SHORT_PRESS)
+        if self.pressed and not self.long_reported and now >= self.pressed_at + self.long_press:
+            self.long_reported = True
+            events.append(LONG_PRESS)
+        return events
+
+
+class Button:
+    """A debounced GPIO button whose actions run on the caller's thread
+
+    The GPIO callback only timestamps the edge and wakes `serve()`, which
+    blocks until the next edge or debounce deadline and then runs the
+    short/long press action.
+    """
+
+    def __init__(self, gpio, pin, on_short=None, on_long=None, settle=DEBOUNCE_TIME,
+                 long_press=LONG_PRESS_TIME, clock=time.monotonic):
+        self.gpio = gpio
+        self.pin = pin
+        self.actions = {SHORT_PRESS: on_short, LONG_PRESS: on_long}
+        self.debouncer = Debouncer(settle, long_press, pressed_level=gpio.LOW)
+        self.clock = clock
+        self._cond = threading.Condition()
+        self._stopped = False
+
+    def setup(self):
+        # Note: GPIO2 already has hardware pull-up
+        self.gpio.setup(self.pin, self.gpio.IN)
+        self.gpio.add_event_detect(self.pin, self.gpio.BOTH, callback=self._on_edge)
+
+    def _on_edge(self, channel):
+        timestamp = self.clock()
+        level = self.gpio.input(self.pin)
+        with self._cond:
+            self.debouncer.edge(level, timestamp)
+            self._cond.notify()
+
+    def dispatch_due(self):
+        """Run the actions for presses completed by now"""
+        with self._cond:
+            events = self.debouncer.poll(self.clock())
+        for event in events:
+            action = self.actions[event]
+            if action:
+                action()
+        return events
+
+    def serve(self):
+        """Block handling presses until stop() is called"""
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                deadline = self.debouncer.next_deadline()
+                timeout = None if deadline is None else max(0.0, deadline - self.clock())
+                self._cond.wait(timeout)
+            self.dispatch_due()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
 
 def run_script():
-    print("Executing script...")
-    # Using shell=False for better security
-    subprocess.Popen(["/bin/bash", SCRIPT])
-
-def button_pressed(channel):
-    # Extra debounce protection for GPIO2
-    time.sleep(DEBOUNCE_TIME)
-    if GPIO.input(BUTTON_PIN) == GPIO.LOW:
-        # Additional check to avoid false triggers
-        for _ in range(3):
-            if GPIO.input(BUTTON_PIN) == GPIO.HIGH:
-                return
-            time.sleep(0.05)
-        run_script()
-
-def setup_gpio():
-    GPIO.setmode(GPIO.BCM)
-    # Note: GPIO2 already has hardware pull-up
-    GPIO.setup(BUTTON_PIN, GPIO.IN)
-    
+    """Toggle the resident detector, launching it if it is not running"""
+    try:
+        reply = send_command("toggle")
+    except NOT_RUNNING:
+        print("Detector service not running, starting it...")
+        # Using shell=False for better security
+        subprocess.Popen(["/bin/bash", SCRIPT, "--start"])
+        return
+    except OSError as e:
+        # Alive but slow (e.g. still pausing); never launch a second one
+        print(f"Detector service busy, press ignored: {e}")
+        return
+    if reply.get("ok"):
+        print(f"Detector {reply['state']}")
+    else:
+        print(f"Detector error: {reply.get('error')}")
+
+def show_status():
+    """Print what the detector is doing (long press)"""
+    try:
+        print(f"Detector status: {send_command('status')}")
+    except NOT_RUNNING:
+        print("Detector service not running")
+    except OSError as e:
+        print(f"Detector service busy: {e}")
+
+def setup_gpio(gpio):
+    gpio.setmode(gpio.BCM)
+
     # Wait for system to fully boot before enabling button
-    time.sleep(5)
-    GPIO.add_event_detect(BUTTON_PIN, GPIO.FALLING, 
-                         callback=button_pressed, 
-                         bouncetime=300)
+    time.sleep(BOOT_DELAY)
+    button = Button(gpio, BUTTON_PIN, on_short=run_script, on_long=show_status)
+    button.setup()
+    return button
 
 if __name__ == "__main__":
-    setup_gpio()
+    GPIO = load_gpio()
+    button = setup_gpio(GPIO)
     try:
-        print("Button controller running on GPIO2. Press CTRL+C to exit.")
-        while True:
-            time.sleep(1)
+        print("Button controller running on GPIO2. Short press: start/pause, "
+              "long press: status. Press CTRL+C to exit.")
+        button.serve()
     except KeyboardInterrupt:
-        GPIO.cleanup()
\ No newline at end of file
+        GPIO.cleanup()
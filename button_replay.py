@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Replay recorded button edge sequences through button_control.Button
+
+Uses MockGPIO and a simulated clock, so no Pi and no waiting are needed:
+
+    python button_replay.py            # run the built-in scenarios
+"""
+import sys
+
+from button_control import Button, DEBOUNCE_TIME, LONG_PRESS_TIME, LONG_PRESS, SHORT_PRESS
+from leds import MockGPIO
+
+PIN = 2
+
+
+class SimulatedClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def replay(edges, until=None, settle=DEBOUNCE_TIME, long_press=LONG_PRESS_TIME):
+    """Feed (time, level) edges to a Button and return [(time, press)] it reports
+
+    Between edges the clock jumps straight to each debounce deadline, exactly
+    as Button.serve() would wake up for it.
+    """
+    gpio = MockGPIO()
+    clock = SimulatedClock()
+    reported = []
+    button = Button(gpio, PIN,
+                    on_short=lambda: reported.append((clock.now, SHORT_PRESS)),
+                    on_long=lambda: reported.append((clock.now, LONG_PRESS)),
+                    settle=settle, long_press=long_press, clock=clock)
+    gpio.levels[PIN] = gpio.HIGH
+    button.setup()
+
+    def run_deadlines(limit):
+        while True:
+            deadline = button.debouncer.next_deadline()
+            if deadline is None or deadline > limit:
+                return
+            clock.now = max(clock.now, deadline)
+            button.dispatch_due()
+
+    for timestamp, level in edges:
+        run_deadlines(timestamp)
+        clock.now = timestamp
+        gpio.levels[PIN] = level
+        gpio.callbacks[PIN](PIN)
+    last = edges[-1][0] if edges else 0.0
+    run_deadlines(until if until is not None else last + long_press + settle)
+    return reported
+
+
+def bounce(start, level, count=4, gap=0.002):
+    """Contact bounce: `count` rapid flips that settle on `level`"""
+    edges = []
+    for i in range(count):
+        edges.append((start + i * gap, level if i % 2 == 0 else 1 - level))
+    edges.append((start + count * gap, level))
+    return edges
+
+
+SCENARIOS = {
+    "clean short press": (
+        [(1.0, 0), (1.2, 1)], [SHORT_PRESS]),
+    "bouncy short press": (
+        bounce(1.0, 0) + bounce(1.3, 1), [SHORT_PRESS]),
+    "long press fires while held": (
+        bounce(1.0, 0) + bounce(3.0, 1), [LONG_PRESS]),
+    "glitch shorter than debounce": (
+        [(1.0, 0), (1.01, 1)], []),
+    "two presses": (
+        bounce(1.0, 0) + bounce(1.2, 1) + bounce(2.0, 0) + bounce(2.3, 1),
+        [SHORT_PRESS, SHORT_PRESS]),
+    "press still held at end": (
+        [(1.0, 0)], [LONG_PRESS]),
+}
+
+
+def main():
+    failed = 0
+    for name, (edges, expected) in SCENARIOS.items():
+        presses = [press for _, press in replay(edges)]
+        if presses == expected:
+            print(f"✅ {name}: {presses}")
+        else:
+            failed += 1
+            print(f"❌ {name}: expected {expected}, got {presses}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
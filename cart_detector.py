@@ -0,0 +1,157 @@
+import sys
+
+from inference import Detections, load_backend
+from catalog import ProductCatalog
+from product_classes import ClassTable, cart_delta
+from cart_store import CartStore, cart_items, synced_seq
+from cart_journal import CartJournal
+from cart_writer import CartWriter
+from tracker import ProductTracker
+from motion import MotionGate
+from roi import RoiSelector, detect_in_region, draw_region
+from overlay import draw_detections
+from startup import Startup, init_firestore, open_camera
+from metrics import span, timed, record_all
+
+
+def init_cart(db):
+    """Cart store, local journal and the background sync thread"""
+    # Cart items are a barcode-keyed map changed only through the journal
+    store = CartStore(db)
+    print(f"🛒 Cart {store.cart_id} in store {store.store}")
+    try:
+        store.migrate()
+    except Exception as e:
+        print(f"⚠️ Could not check cart layout, continuing offline: {e}")
+
+    # Every scan goes to the local journal first and is synced in the
+    # background, so nothing is lost while the Wi-Fi is down
+    journal = CartJournal()
+    store.watch(lambda cart: journal.apply_remote(
+        cart_items(cart), synced_seq(cart, journal.journal_id)))
+    writer = CartWriter(store, journal)
+    writer.start()
+    return store, journal, writer
+
+
+class CartDetector:
+    """Camera frames in, cart deltas out
+
+    Shared by detect_products.py and raspberry_pi_detect_products.py. Firestore,
+    the catalog, the cart sync, the model and the class table are filled in
+    by start_system(), which loads them in parallel. Subclasses react to
+    detections and cart changes through on_detections() and on_added(), which
+    is how the Pi drives its LEDs.
+    """
+
+    def __init__(self):
+        self.db = None
+        self.catalog = None
+        self.cart_store = None
+        self.cart_journal = None
+        self.cart_writer = None
+        self.model = None
+        self.class_table = None
+
+        # Each physical item gets a track and is added once, after it has been
+        # seen with the same class in a few consecutive frames
+        self.tracker = ProductTracker()
+
+        # Skip YOLO on frames where nothing in front of the camera has changed
+        self.motion_gate = MotionGate()
+        self.last_detections = (Detections.empty(), [])
+
+        # Only the drop zone (grown around active tracks) is passed to the model
+        self.roi_selector = RoiSelector()
+        self.last_region = None
+
+    def start_system(self):
+        """Load everything the detector needs in parallel and return the camera"""
+        startup = Startup()
+        startup.run("firestore", init_firestore)
+        # Load the product catalog once; a snapshot listener keeps it current
+        startup.run("catalog", lambda db: ProductCatalog(db).start(), "firestore")
+        startup.run("cart", init_cart, "firestore")
+        # ONNX Runtime when an exported model is available, else PyTorch
+        startup.run("model", load_backend)
+        startup.run("camera", open_camera)
+        # Resolve every model class to its catalog record once; fails fast if a
+        # class has no product in the catalog
+        startup.run("classes", lambda model, catalog: ClassTable(model.names, catalog),
+                    "model", "catalog")
+
+        try:
+            cap = startup.result("camera")
+        except RuntimeError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        self.db = startup.result("firestore")
+        self.catalog = startup.result("catalog")
+        self.cart_store, self.cart_journal, self.cart_writer = startup.result("cart")
+        self.model = startup.result("model")
+        self.class_table = startup.result("classes")
+        startup.report()
+        return cap
+
+    @timed("cart.add")
+    def add_to_cart(self, delta):
+        """Record one frame's (ProductRecord, quantity) pairs in the cart journal
+        together; they are synced in the background
+        """
+        new = self.cart_writer.add_many(delta)
+        for product, quantity in delta:
+            count = f" x{quantity}" if quantity > 1 else ""
+            if product in new:
+                print(f"✅ Added to cart: {product.name}{count}")
+            else:
+                print(f"➕ Updated quantity for: {product.name}{count}")
+        self.on_added(new)
+        return new
+
+    @timed("frame")
+    def process_frame(self, frame, draw=True):
+        """Detect and track products, returning the annotated frame and the
+        cart delta for the items confirmed on this frame
+        """
+        # Run the model only when the scene changed or a track still needs frames
+        with span("motion"):
+            changed = self.motion_gate.should_infer(frame, force=self.tracker.has_unconfirmed())
+        if not changed:
+            if draw:
+                with span("draw"):
+                    if self.last_region:
+                        draw_region(frame, self.last_region)
+                    draw_detections(frame, self.last_detections[0], self.class_table,
+                                    self.last_detections[1])
+            return frame, []
+
+        # Crop to the drop zone plus active tracks; detections come back in
+        # full-frame coordinates, sorted by confidence (highest first)
+        self.last_region = self.roi_selector.region(frame.shape, self.tracker.boxes)
+        with span("detect"):
+            detections = detect_in_region(self.model, frame, self.last_region)
+        record_all("model", self.model.timings)
+        # One box per physical item, even if the model labelled it twice
+        detections = detections.deduplicated()
+        self.on_detections(detections)
+
+        # Match detections to tracks; confident ones start or continue a track
+        with span("track"):
+            track_ids, confirmed = self.tracker.update(
+                detections.boxes, detections.confs, detections.class_ids)
+
+        self.last_detections = (detections, track_ids)
+        if draw:
+            with span("draw"):
+                draw_region(frame, self.last_region)
+                draw_detections(frame, detections, self.class_table, track_ids)
+
+        # Each track is added exactly once; everything confirmed on this frame
+        # goes to the cart as one change
+        return frame, cart_delta([self.class_table[class_id] for _, class_id in confirmed])
+
+    def on_detections(self, detections):
+        """Called with every frame of detections the model produced"""
+
+    def on_added(self, new):
+        """Called after a cart delta was recorded, with the products new to the cart"""
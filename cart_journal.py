@@ -0,0 +1,227 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from device import STATE_DIR, device_id
+
+# Local journal file, shared by every process on this device
+JOURNAL_PATH = os.path.join(STATE_DIR, "cart_journal.db")
+# Cart ID used before carts were keyed by device
+LEGACY_CART_ID = "current"
+# Synced entries kept around for debugging before they are pruned
+JOURNAL_KEEP = 10000
+
+# One cart mutation; `op` is "add" (delta may be negative) or "clear"
+JournalEntry = namedtuple("JournalEntry", ["seq", "op", "barcode", "name", "price", "delta"])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS journal (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    cart_id TEXT NOT NULL,
+    op TEXT NOT NULL,
+    barcode TEXT,
+    name TEXT,
+    price REAL,
+    delta INTEGER,
+    created_at REAL NOT NULL,
+    synced INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS journal_unsynced ON journal (cart_id, synced, seq);
+CREATE TABLE IF NOT EXISTS items (
+    cart_id TEXT NOT NULL,
+    barcode TEXT NOT NULL,
+    name TEXT NOT NULL,
+    price REAL NOT NULL,
+    quantity INTEGER NOT NULL,
+    PRIMARY KEY (cart_id, barcode)
+);
+"""
+
+
+class CartJournal:
+    """Append-only local log of cart mutations plus the resulting cart view
+
+    Every change is written to SQLite first with a sequence number, so scans
+    survive Wi-Fi drops and restarts. The `items` table always reflects the last
+    known remote cart plus the entries not yet synced, which is what the GUI
+    renders.
+    """
+
+    def __init__(self, path=JOURNAL_PATH, cart_id=None):
+        self.cart_id = cart_id or device_id()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self.journal_id = self._journal_id()
+        self._adopt_legacy()
+
+    def _adopt_legacy(self):
+        # Scans made on this device before carts had IDs belong to its cart
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT seq, op, barcode, name, price, delta FROM journal "
+                "WHERE cart_id = ? AND synced = 0 ORDER BY seq", (LEGACY_CART_ID,)).fetchall()
+            # Checked only when there is something to adopt, so a journal for
+            # an explicit cart ID never creates this device's ID file
+            if not rows or self.cart_id != device_id():
+                return
+            self._conn.execute(
+                "UPDATE journal SET cart_id = ? WHERE cart_id = ? AND synced = 0",
+                (self.cart_id, LEGACY_CART_ID))
+            self._conn.execute("DELETE FROM items WHERE cart_id = ?", (LEGACY_CART_ID,))
+            for entry in map(JournalEntry._make, rows):
+                self._apply(entry.op, entry.barcode, entry.name, entry.price, entry.delta)
+        print(f"🔄 Moved {len(rows)} unsynced scans to cart {self.cart_id}")
+
+    def _journal_id(self):
+        # Identifies this journal in Firestore so replays can be de-duplicated
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'journal_id'").fetchone()
+            if row:
+                return row[0]
+            journal_id = uuid.uuid4().hex
+            self._conn.execute("INSERT INTO meta (key, value) VALUES ('journal_id', ?)", (journal_id,))
+            return journal_id
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # Mutations
+
+    def add_many(self, deltas):
+        """Record several adds in one transaction
+
+        `deltas` is a list of (product, quantity) pairs. Returns the products
+        that were new to the cart.
+        """
+        new = []
+        with self._lock, self._conn:
+            for product, quantity in deltas:
+                if self._quantity(product.barcode) == 0:
+                    new.append(product)
+                self._append("add", product.barcode, product.name, product.price, quantity)
+        return new
+
+    def change_quantity(self, barcode, change):
+        """Record a quantity change for an item already in the cart"""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT name, price FROM items WHERE cart_id = ? AND barcode = ?",
+                (self.cart_id, barcode)).fetchone()
+            if row is None:
+                return False
+            self._append("add", barcode, row[0], row[1], change)
+        return True
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._append("clear", None, None, None, None)
+
+    def _append(self, op, barcode, name, price, delta):
+        self._conn.execute(
+            "INSERT INTO journal (cart_id, op, barcode, name, price, delta, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.cart_id, op, barcode, name, price, delta, time.time()))
+        self._apply(op, barcode, name, price, delta)
+
+    def _apply(self, op, barcode, name, price, delta):
+        if op == "clear":
+            self._conn.execute("DELETE FROM items WHERE cart_id = ?", (self.cart_id,))
+            return
+        self._conn.execute(
+            "INSERT INTO items (cart_id, barcode, name, price, quantity) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (cart_id, barcode) DO UPDATE SET quantity = quantity + excluded.quantity",
+            (self.cart_id, barcode, name, price, delta))
+        self._conn.execute(
+            "DELETE FROM items WHERE cart_id = ? AND barcode = ? AND quantity <= 0",
+            (self.cart_id, barcode))
+
+    def _quantity(self, barcode):
+        row = self._conn.execute(
+            "SELECT quantity FROM items WHERE cart_id = ? AND barcode = ?",
+            (self.cart_id, barcode)).fetchone()
+        return row[0] if row else 0
+
+    # Local cart view
+
+    def items(self):
+        """Current cart items as dicts, sorted by name"""
+        with self._lock:
+            return self._items()
+
+    def snapshot(self):
+        """Current items plus the last journal sequence number they include"""
+        with self._lock:
+            last_seq = self._conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM journal WHERE cart_id = ?",
+                (self.cart_id,)).fetchone()[0]
+            return self._items(), last_seq
+
+    def _items(self):
+        rows = self._conn.execute(
+            "SELECT barcode, name, price, quantity FROM items WHERE cart_id = ? ORDER BY name, barcode",
+            (self.cart_id,)).fetchall()
+        return [{"barcode": b, "name": n, "price": p, "quantity": q} for b, n, p, q in rows]
+
+    def apply_remote(self, items, synced_seq=None):
+        """Replace the local view with a remote snapshot plus the entries it lacks
+
+        `synced_seq` is the last entry of this journal the snapshot includes
+        (its `synced_seq.<journal_id>`). The local `synced` flag cannot be used
+        for this: a snapshot may arrive just before or just after mark_synced()
+        for the commit it reflects, which would count an entry twice or not at
+        all. Without `synced_seq` (no cart document) unsynced entries are used.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM items WHERE cart_id = ?", (self.cart_id,))
+            for item in items:
+                self._apply("add", item["barcode"], item["name"], item["price"], item["quantity"])
+            pending = self._unsynced() if synced_seq is None else self._after(synced_seq)
+            for entry in pending:
+                self._apply(entry.op, entry.barcode, entry.name, entry.price, entry.delta)
+
+    def _after(self, seq):
+        rows = self._conn.execute(
+            "SELECT seq, op, barcode, name, price, delta FROM journal "
+            "WHERE cart_id = ? AND seq > ? ORDER BY seq",
+            (self.cart_id, seq)).fetchall()
+        return [JournalEntry(*row) for row in rows]
+
+    # Sync bookkeeping
+
+    def unsynced(self, limit=500):
+        with self._lock:
+            return self._unsynced(limit)
+
+    def _unsynced(self, limit=-1):
+        rows = self._conn.execute(
+            "SELECT seq, op, barcode, name, price, delta FROM journal "
+            "WHERE cart_id = ? AND synced = 0 ORDER BY seq LIMIT ?",
+            (self.cart_id, limit)).fetchall()
+        return [JournalEntry(*row) for row in rows]
+
+    def unsynced_count(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM journal WHERE cart_id = ? AND synced = 0",
+                (self.cart_id,)).fetchone()[0]
+
+    def mark_synced(self, upto_seq):
+        """Mark every entry up to `upto_seq` as applied remotely and prune old ones"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE journal SET synced = 1 WHERE cart_id = ? AND seq <= ?",
+                (self.cart_id, upto_seq))
+            self._conn.execute(
+                "DELETE FROM journal WHERE synced = 1 AND seq <= ?",
+                (upto_seq - JOURNAL_KEEP,))
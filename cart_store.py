@@ -0,0 +1,248 @@
+import uuid
+
+from firebase_admin import firestore
+
+from device import device_id, STORE_ID
+
+CARTS = "carts"
+
+
+def cart_items(cart):
+    """Cart items as a list sorted by name
+
+    Accepts the barcode-keyed `items` map as well as the older array layout.
+    """
+    if not cart:
+        return []
+    items = cart.get("items") or {}
+    if isinstance(items, dict):
+        items = items.values()
+    return sorted(items, key=lambda item: item.get("name", ""))
+
+
+class CartChangedError(Exception):
+    """The cart gained synced items after the checkout snapshot was taken"""
+
+
+class InvoiceExistsError(Exception):
+    """Another checkout already used this invoice number"""
+
+
+def synced_seq(cart, journal_id):
+    """Last entry of a CartJournal included in a cart snapshot, None without a cart"""
+    if cart is None:
+        return None
+    return (cart.get("synced_seq") or {}).get(journal_id, 0)
+
+
+def other_journals(cart, journal_id):
+    """synced_seq of every journal but `journal_id`, i.e. what other devices synced"""
+    return {other: seq for other, seq in ((cart or {}).get("synced_seq") or {}).items()
+            if other != journal_id and seq}
+
+
+class CartStore:
+    """Cart document whose items are a map keyed by barcode
+
+    Changes arrive only as CartJournal entries replayed by apply_journal(), a
+    transaction touching only the affected items, so the camera and the GUI
+    can change the same cart without overwriting each other and the cost does
+    not grow with the cart size.
+
+    Each device has its own document, `carts/<device id>`, so carts never
+    contend for a shared document. The cart also carries the current shopper
+    `session`, which checkout closes and replaces with a fresh one.
+    """
+
+    def __init__(self, db, cart_id=None, store=STORE_ID):
+        self.db = db
+        self.cart_id = cart_id or device_id()
+        self.store = store
+        self.cart_ref = db.collection(CARTS).document(self.cart_id)
+        self._watch = None
+
+    def _new_cart(self, **fields):
+        """Fields of a freshly created cart document"""
+        return {
+            "items": {},
+            "device": self.cart_id,
+            "store": self.store,
+            "session": uuid.uuid4().hex,
+            "session_started": firestore.SERVER_TIMESTAMP,
+            **fields,
+        }
+
+    def _item_path(self, barcode, *fields):
+        return self.db.field_path("items", barcode, *fields)
+
+    def migrate(self):
+        """Create the cart, or bring an older one up to date
+
+        Converts the old `items` array to the barcode map and adds the store and
+        session fields the kiosk listener relies on.
+        """
+        @firestore.transactional
+        def apply(transaction):
+            snapshot = self.cart_ref.get(transaction=transaction)
+            cart = snapshot.to_dict() if snapshot.exists else None
+            if cart is None:
+                transaction.set(self.cart_ref, self._new_cart())
+                return
+            if "session" not in cart or cart.get("store") != self.store:
+                # Carts created before sessions, or moved to another store
+                transaction.update(self.cart_ref, {
+                    "device": self.cart_id,
+                    "store": self.store,
+                    "session": cart.get("session") or uuid.uuid4().hex,
+                })
+            if isinstance(cart.get("items"), list):
+                items = {}
+                for item in cart["items"]:
+                    barcode = item.get("barcode", "")
+                    if barcode in items:
+                        items[barcode]["quantity"] += item["quantity"]
+                    else:
+                        items[barcode] = dict(item)
+                transaction.update(self.cart_ref, {"items": items})
+                print(f"🔄 Migrated cart to barcode-keyed items ({len(items)} items)")
+
+        apply(self.db.transaction())
+
+    def apply_journal(self, journal_id, entries):
+        """Replay CartJournal entries in one transaction
+
+        The cart remembers the last sequence number applied from each journal
+        (`synced_seq.<journal_id>`), so replaying the same entries twice, e.g.
+        after a timeout whose commit actually went through, changes nothing.
+        Only the touched items are read, keeping the cost independent of cart size.
+        """
+        seq_path = self.db.field_path("synced_seq", journal_id)
+        barcodes = {entry.barcode for entry in entries if entry.op != "clear"}
+
+        @firestore.transactional
+        def apply(transaction):
+            snapshot = self.cart_ref.get(
+                field_paths=[seq_path] + [self._item_path(barcode) for barcode in barcodes],
+                transaction=transaction)
+            cart = (snapshot.to_dict() if snapshot.exists else None) or {}
+            synced = (cart.get("synced_seq") or {}).get(journal_id, 0)
+            todo = [entry for entry in entries if entry.seq > synced]
+            if not todo:
+                return
+
+            items = {barcode: dict(item) for barcode, item in (cart.get("items") or {}).items()}
+            cleared = False
+            touched = set()
+            for entry in todo:
+                if entry.op == "clear":
+                    items = {}
+                    cleared = True
+                    touched = set()
+                    continue
+                item = items.setdefault(entry.barcode, {
+                    "barcode": entry.barcode,
+                    "name": entry.name,
+                    "price": entry.price,
+                    "quantity": 0
+                })
+                item["quantity"] += entry.delta
+                item["timestamp"] = firestore.SERVER_TIMESTAMP
+                touched.add(entry.barcode)
+
+            live = {barcode: item for barcode, item in items.items() if item["quantity"] > 0}
+            if not snapshot.exists:
+                transaction.set(self.cart_ref, self._new_cart(items=live, synced_seq={journal_id: todo[-1].seq}))
+                return
+            update = {seq_path: todo[-1].seq}
+            if cleared:
+                update["items"] = live
+            else:
+                for barcode in touched:
+                    update[self._item_path(barcode)] = live.get(barcode, firestore.DELETE_FIELD)
+            transaction.update(self.cart_ref, update)
+
+        apply(self.db.transaction())
+
+    def checkout(self, journal_id, upto_seq, invoice, others):
+        """Add an invoice and empty the cart in a single transaction
+
+        Journal entries up to `upto_seq` are covered by the invoice, so they are
+        marked as applied and will not be replayed into the emptied cart.
+        `others` is other_journals() of the cart snapshot the invoice was built
+        from. If the cart holds entries that are not on the invoice, i.e. later
+        entries of this journal or anything another device synced since that
+        snapshot, CartChangedError is raised instead of clearing them. Retrying with the same invoice number and
+        `checkout_id` after an ambiguous failure does nothing if the first
+        attempt went through. The invoice records the cart and shopper session
+        it closes, and the cart starts a new session for the next shopper.
+        """
+        seq_path = self.db.field_path("synced_seq", journal_id)
+        # Invoice numbers are unique, so they double as document IDs
+        invoice_ref = self.db.collection("invoices").document(invoice.get("invoice_number"))
+
+        @firestore.transactional
+        def apply(transaction):
+            existing = invoice_ref.get(transaction=transaction)
+            if existing.exists:
+                if (existing.to_dict() or {}).get("checkout_id") == invoice.get("checkout_id"):
+                    return
+                # The local invoice counter was reset; never overwrite an invoice
+                raise InvoiceExistsError(f"Invoice {invoice_ref.id} already exists for another checkout")
+            snapshot = self.cart_ref.get(field_paths=["synced_seq", "session"], transaction=transaction)
+            cart = (snapshot.to_dict() if snapshot.exists else None) or {}
+            synced = (cart.get("synced_seq") or {}).get(journal_id, 0)
+            if synced > upto_seq:
+                raise CartChangedError(f"cart has entries up to {synced}, invoice covers {upto_seq}")
+            # Scans synced by another device (the cart's own detector when
+            # checking out from a kiosk) are tracked under their own journal
+            if other_journals(cart, journal_id) != others:
+                raise CartChangedError("another device changed the cart after the invoice was built")
+            # create() fails if the number was taken concurrently
+            transaction.create(invoice_ref, {**invoice, "cart_id": self.cart_id,
+                                             "session": cart.get("session")})
+            if snapshot.exists:
+                transaction.update(self.cart_ref, {
+                    "items": {},
+                    seq_path: upto_seq,
+                    "session": uuid.uuid4().hex,
+                    "session_started": firestore.SERVER_TIMESTAMP,
+                })
+            else:
+                transaction.set(self.cart_ref, self._new_cart(synced_seq={journal_id: upto_seq}))
+
+        apply(self.db.transaction())
+        return invoice_ref.id
+
+    def watch(self, callback):
+        """Call `callback(cart)` with the cart dict on every remote change"""
+        def listener(doc_snapshot, changes, read_time):
+            callback(doc_snapshot[0].to_dict() if doc_snapshot else None)
+
+        self._watch = self.cart_ref.on_snapshot(listener)
+        return self
+
+    def unwatch(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+
+def watch_carts(db, callback, store=STORE_ID):
+    """Watch every cart of a store through one collection-group listener
+
+    `callback(changes)` gets a dict of cart_id -> cart dict (None when the
+    cart was deleted) with only the carts that changed, so a kiosk showing
+    50+ carts handles one small batch per update. Needs a collection-group
+    index on `carts.store`. Returns the watch; call unsubscribe() to stop.
+    """
+    query = db.collection_group(CARTS)
+    if store:
+        query = query.where("store", "==", store)
+
+    def listener(snapshots, changes, read_time):
+        callback({
+            change.document.id: None if change.type.name == "REMOVED" else change.document.to_dict()
+            for change in changes
+        })
+
+    return query.on_snapshot(listener)
@@ -0,0 +1,127 @@
+import random
+import threading
+import time
+
+from metrics import span
+
+# Gather detections for this long before writing them out (seconds)
+BATCH_WINDOW = 0.25
+# Retry backoff for failed flushes (seconds)
+RETRY_INITIAL = 0.5
+RETRY_MAX = 30.0
+# Check the journal at least this often, for entries written by other processes
+POLL_INTERVAL = 5.0
+# Journal entries replayed per Firestore transaction
+SYNC_BATCH = 200
+
+
+class CartWriter(threading.Thread):
+    """Write-behind sync from a CartJournal to Firestore
+
+    Mutations are recorded in the local journal and return immediately. This
+    thread waits `window` seconds so a burst of scans goes out together, then
+    replays the unsynced entries through `CartStore.apply_journal`, which is
+    idempotent. Failed syncs are retried with exponential backoff, and anything
+    left over from a previous run or an outage is replayed once the network is
+    back.
+    """
+
+    def __init__(self, store, journal, window=BATCH_WINDOW):
+        super().__init__(name="cart-writer", daemon=True)
+        self.store = store
+        self.journal = journal
+        self.window = window
+        self._cond = threading.Condition()
+        self._sync_lock = threading.Lock()
+        self._dirty = True  # sync whatever a previous run left behind
+        self._stopped = False
+        self.flushes = 0
+        self.retries = 0
+
+    def add_many(self, deltas):
+        """Record (product, quantity) pairs together; returns the products new to the cart"""
+        with span("journal.add"):
+            new = self.journal.add_many(deltas)
+        self._wake()
+        return new
+
+    def change_quantity(self, barcode, change):
+        changed = self.journal.change_quantity(barcode, change)
+        self._wake()
+        return changed
+
+    def clear(self):
+        self.journal.clear()
+        self._wake()
+
+    def pending_count(self):
+        return self.journal.unsynced_count()
+
+    def stop(self, timeout=5.0):
+        """Sync whatever is still queued and stop the worker"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self.is_alive():
+            self.join(timeout)
+
+    def _wake(self):
+        with self._cond:
+            self._dirty = True
+            self._cond.notify()
+
+    def sync(self):
+        """Replay all unsynced journal entries; returns how many were applied"""
+        synced = 0
+        with self._sync_lock:
+            while True:
+                entries = self.journal.unsynced(SYNC_BATCH)
+                if not entries:
+                    return synced
+                with span("firestore.sync"):
+                    self.store.apply_journal(self.journal.journal_id, entries)
+                self.journal.mark_synced(entries[-1].seq)
+                self.flushes += 1
+                synced += len(entries)
+
+    def checkout(self, upto_seq, invoice, others):
+        """Save an invoice and empty the cart in one transaction
+
+        `upto_seq` is the journal position the invoice items were read at; those
+        entries are settled by the checkout, later scans are kept and synced.
+        `others` is what other devices had synced into the cart the invoice was
+        built from (see CartStore.checkout).
+        """
+        with self._sync_lock:
+            with span("firestore.checkout"):
+                self.store.checkout(self.journal.journal_id, upto_seq, invoice, others)
+            self.journal.mark_synced(upto_seq)
+            self.journal.apply_remote([], upto_seq)
+
+    def run(self):
+        backoff = RETRY_INITIAL
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._dirty or self._stopped, POLL_INTERVAL)
+                stopping = self._stopped
+                self._dirty = False
+            if not stopping:
+                # Let a burst of detections pile up so it goes out as one write
+                time.sleep(self.window)
+
+            try:
+                self.sync()
+                backoff = RETRY_INITIAL
+            except Exception as e:
+                if stopping:
+                    print(f"❌ Error updating cart, {self.pending_count()} changes kept in the local journal: {e}")
+                    return
+                self.retries += 1
+                delay = backoff * (1 + random.random() * 0.2)
+                print(f"❌ Error updating cart: {e} (retrying in {delay:.1f}s)")
+                with self._cond:
+                    self._cond.wait_for(lambda: self._stopped, delay)
+                    self._dirty = True
+                backoff = min(backoff * 2, RETRY_MAX)
+            if stopping:
+                return
@@ -0,0 +1,169 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import closing
+
+from device import STATE_DIR
+
+# Check this often whether the snapshot listener is still alive (seconds)
+CATALOG_CHECK = 30.0
+# Last catalog read from Firestore, used when a restart happens offline
+CATALOG_CACHE = os.path.join(STATE_DIR, "catalog_cache.db")
+
+
+class ProductCatalog:
+    """In-memory copy of the products collection
+
+    Loaded once at startup and kept current by a Firestore snapshot listener.
+    A watchdog thread checks the listener every `check_interval` seconds; if
+    it has closed or failed the catalog is reloaded and the listener attached
+    again. Lookups only read the in-memory index and never wait on the network.
+
+    Every catalog read from Firestore is also saved to `cache_path`, so a
+    detector restarted without Wi-Fi starts from the last good catalog; the
+    watchdog replaces it with a fresh read once Firestore is reachable.
+    """
+
+    def __init__(self, db, check_interval=CATALOG_CHECK, cache_path=CATALOG_CACHE):
+        self.db = db
+        self.check_interval = check_interval
+        self.cache_path = cache_path
+        self._stale = False
+        self._by_name = {}
+        self._by_barcode = {}
+        self._lock = threading.Lock()
+        self._watch = None
+        self._listener_failed = False
+        self._stopped = threading.Event()
+        self._subscribers = []
+
+    def start(self):
+        """Load all products and start the snapshot listener and its watchdog"""
+        self.load()
+        self._listen()
+        threading.Thread(target=self._watchdog, name="catalog-watchdog", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def load(self, fallback=True):
+        """Fetch the whole products collection and rebuild the index
+
+        With `fallback`, the local copy is used when Firestore cannot be read;
+        raises only if there is no local copy either.
+        """
+        try:
+            docs = self.db.collection("products").get()
+        except Exception as e:
+            products = self._load_cache() if fallback else None
+            if not products:
+                raise
+            print(f"⚠️ Could not read the catalog, using the local copy: {e}")
+            self._stale = True
+            self._replace(products)
+        else:
+            self._stale = False
+            self._save(self._replace(doc.to_dict() for doc in docs))
+        print(f"📦 Loaded {len(self._by_name)} products into catalog cache")
+
+    def get(self, name):
+        """Product details by class/product name, or None"""
+        return self._by_name.get(name)
+
+    def by_barcode(self, barcode):
+        """Product details by barcode, or None"""
+        return self._by_barcode.get(barcode)
+
+    def subscribe(self, callback):
+        """Call `callback()` after every catalog reload or snapshot"""
+        self._subscribers.append(callback)
+
+    def products(self):
+        return list(self._by_name.values())
+
+    def __len__(self):
+        return len(self._by_name)
+
+    def _listen(self):
+        self._listener_failed = False
+        try:
+            self._watch = self.db.collection("products").on_snapshot(self._on_snapshot)
+        except Exception as e:
+            print(f"⚠️ Catalog listener unavailable, retrying in {self.check_interval:.0f}s: {e}")
+            self._watch = None
+
+    def _on_snapshot(self, docs, changes, read_time):
+        # Every snapshot carries the full collection, so rebuild from scratch
+        try:
+            self._stale = False
+            self._save(self._replace(doc.to_dict() for doc in docs))
+        except Exception as e:
+            print(f"⚠️ Catalog snapshot failed: {e}")
+            self._listener_failed = True
+
+    def _replace(self, products):
+        """Swap in a new index built from product dicts and return the products"""
+        by_name = {}
+        by_barcode = {}
+        for product in products:
+            if not product or "name" not in product:
+                continue
+            by_name[product["name"]] = product
+            if product.get("barcode"):
+                by_barcode[product["barcode"]] = product
+        with self._lock:
+            self._by_name = by_name
+            self._by_barcode = by_barcode
+        for callback in self._subscribers:
+            callback()
+        return list(by_name.values())
+
+    def _load_cache(self):
+        try:
+            with closing(sqlite3.connect(self.cache_path)) as conn:
+                rows = conn.execute("SELECT product FROM products").fetchall()
+        except sqlite3.Error:
+            return []
+        return [json.loads(product) for product, in rows]
+
+    def _save(self, products):
+        """Keep the catalog locally for the next offline start"""
+        try:
+            with closing(sqlite3.connect(self.cache_path)) as conn, conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS products (name TEXT PRIMARY KEY, product TEXT NOT NULL)")
+                conn.execute("DELETE FROM products")
+                # Timestamps and other Firestore types are kept as strings
+                conn.executemany("INSERT INTO products (name, product) VALUES (?, ?)",
+                                 [(p["name"], json.dumps(p, default=str)) for p in products])
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not save the catalog locally: {e}")
+
+    def listener_alive(self):
+        """Whether the snapshot listener is attached and has not closed or failed"""
+        watch = self._watch
+        return (watch is not None and not self._listener_failed
+                and not getattr(watch, "_closed", False))
+
+    def _watchdog(self):
+        while not self._stopped.wait(self.check_interval):
+            if self.listener_alive() and not self._stale:
+                continue
+            # Changes made while the listener was down (or since the local copy
+            # was saved) are only picked up by a reload
+            watch, self._watch = self._watch, None
+            if watch is not None:
+                try:
+                    watch.unsubscribe()
+                except Exception:
+                    pass  # already closed
+            try:
+                # The products already in memory are at least as new as the local copy
+                self.load(fallback=False)
+                self._listen()
+            except Exception as e:
+                print(f"⚠️ Catalog refresh failed, serving cached products: {e}")
@@ -0,0 +1,165 @@
+import argparse
+import csv
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from ids import in_store_barcodes
+
+PRODUCTS = "products"
+# Firestore accepts at most 500 writes per batch
+BATCH_SIZE = 500
+# Batches committed at the same time
+COMMIT_WORKERS = 8
+# Fields a product document is made of; anything else in the input is ignored
+FIELDS = ("name", "barcode", "price")
+
+
+def product_id(product):
+    """Deterministic document ID for a product: its barcode, else its name
+
+    Re-importing the same catalog therefore overwrites the same documents
+    instead of adding a second copy of every product.
+    """
+    key = str(product.get("barcode") or product["name"])
+    # Document IDs cannot contain slashes
+    return re.sub(r"[^A-Za-z0-9_.-]", "-", key)
+
+
+def read_products(path):
+    """Products from a CSV file (with a header row) or a JSON list"""
+    if path.lower().endswith(".json"):
+        with open(path) as f:
+            rows = json.load(f)
+    else:
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+    products = []
+    for row in rows:
+        name = (row.get("name") or "").strip()
+        if not name:
+            continue
+        product = {"name": name, "price": float(row.get("price") or 0)}
+        if product["price"].is_integer():
+            product["price"] = int(product["price"])
+        if row.get("barcode"):
+            product["barcode"] = str(row["barcode"]).strip()
+        products.append(product)
+    return products
+
+
+def plan_import(existing, products, prune=False):
+    """Work out which writes bring the collection in line with `products`
+
+    `existing` maps document ID -> product dict as currently stored. A product
+    without a barcode keeps the one it already has under the same name, so
+    re-runs do not change barcodes already printed on shelf labels; new ones
+    are numbered after the highest in-store barcode in use. Other
+    documents with the name of an imported product are duplicates and are
+    deleted; with `prune` so is every product missing from `products`.
+    Returns (upserts, deletes, diff) where upserts maps document ID -> product
+    and diff lists the names that were added, changed, unchanged and removed.
+    """
+    by_name = {p["name"]: p for p in existing.values() if p.get("name")}
+    # Products without a barcode get the next free in-store EAN-13
+    new_barcodes = in_store_barcodes(
+        [p.get("barcode") for p in existing.values() if p.get("barcode")]
+        + [p["barcode"] for p in products if p.get("barcode")])
+    upserts = {}
+    wanted = set()
+    names = set()
+    diff = {"added": [], "changed": [], "unchanged": [], "removed": []}
+    for product in products:
+        product = {k: product[k] for k in FIELDS if k in product}
+        current = by_name.get(product["name"])
+        if not product.get("barcode"):
+            product["barcode"] = (current or {}).get("barcode") or next(new_barcodes)
+        doc_id = product_id(product)
+        wanted.add(doc_id)
+        names.add(product["name"])
+        if current is None:
+            diff["added"].append(product["name"])
+        elif doc_id not in existing or {k: existing[doc_id].get(k) for k in FIELDS} != product:
+            diff["changed"].append(product["name"])
+        else:
+            diff["unchanged"].append(product["name"])
+            continue
+        upserts[doc_id] = product
+
+    deletes = []
+    for doc_id, product in existing.items():
+        if doc_id in wanted:
+            continue
+        if product.get("name") in names:
+            deletes.append(doc_id)
+        elif prune:
+            deletes.append(doc_id)
+            diff["removed"].append(product.get("name") or doc_id)
+    return upserts, deletes, diff
+
+
+def commit_writes(db, upserts, deletes, batch_size=BATCH_SIZE, workers=COMMIT_WORKERS):
+    """Apply upserts and deletes in WriteBatches of `batch_size`, committed in parallel"""
+    collection = db.collection(PRODUCTS)
+    writes = [(doc_id, product) for doc_id, product in upserts.items()]
+    writes += [(doc_id, None) for doc_id in deletes]
+    batches = []
+    for start in range(0, len(writes), batch_size):
+        batch = db.batch()
+        for doc_id, product in writes[start:start + batch_size]:
+            ref = collection.document(doc_id)
+            if product is None:
+                batch.delete(ref)
+            else:
+                batch.set(ref, product)
+        batches.append(batch)
+    if not batches:
+        return 0
+    with ThreadPoolExecutor(max_workers=min(workers, len(batches))) as pool:
+        # list() re-raises the first failed commit
+        list(pool.map(lambda batch: batch.commit(), batches))
+    return len(batches)
+
+
+def print_diff(diff):
+    for label, icon in (("added", "➕"), ("changed", "✏️"), ("removed", "➖")):
+        for name in sorted(diff[label]):
+            print(f"{icon} {label:8} {name}")
+    print(f"📦 {len(diff['added'])} added, {len(diff['changed'])} changed, "
+          f"{len(diff['unchanged'])} unchanged, {len(diff['removed'])} removed")
+
+
+def import_catalog(db, products, prune=False, dry_run=False):
+    """Upsert `products` into the products collection and print what changed
+
+    Reads the collection once and writes only the products that differ. The
+    duplicate auto-ID copies left by older versions of create_db_structure.py
+    are deleted; with `prune` so is every product not in `products`.
+    """
+    existing = {doc.id: doc.to_dict() or {} for doc in db.collection(PRODUCTS).get()}
+    upserts, deletes, diff = plan_import(existing, products, prune)
+    print_diff(diff)
+    if dry_run:
+        print("🔎 Dry run, nothing written")
+        return diff
+    batches = commit_writes(db, upserts, deletes)
+    if batches:
+        print(f"✅ Wrote {len(upserts) + len(deletes)} documents in {batches} batches")
+    return diff
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Import or refresh the product catalog")
+    parser.add_argument("path", help="CSV (name,price[,barcode] header) or JSON list of products")
+    parser.add_argument("--prune", action="store_true",
+                        help="delete products that are not in the file")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="print the changes without writing them")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    from startup import init_firestore
+
+    args = parse_args()
+    import_catalog(init_firestore(), read_products(args.path), args.prune, args.dry_run)
@@ -0,0 +1,93 @@
+import json
+import os
+import socket
+import threading
+
+# Local control socket of the resident detector service
+CONTROL_SOCKET = "/tmp/smart_cart_detector.sock"
+COMMANDS = ("start", "pause", "resume", "toggle", "status")
+# Errors from send_command() that mean no service is listening; anything
+# else (a timeout in particular) means it is alive but busy
+NOT_RUNNING = (FileNotFoundError, ConnectionRefusedError)
+
+
+def send_command(command, path=CONTROL_SOCKET, timeout=2.0):
+    """Send one command to the detector service and return its reply dict
+
+    Raises one of NOT_RUNNING if the service is not running, and another
+    OSError (e.g. socket.timeout while a slow pause completes) if it is
+    running but did not answer in time.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall(command.encode() + b"\n")
+        with sock.makefile("rb") as reply:
+            return json.loads(reply.readline() or b"{}")
+
+
+class ControlServer(threading.Thread):
+    """Answer one-line commands on a Unix socket with one-line JSON replies
+
+    `handlers` maps command names to functions returning a dict. Binding
+    fails with RuntimeError if another live process already owns the socket,
+    which is what keeps a second detector from ever opening the camera.
+    """
+
+    def __init__(self, handlers, path=CONTROL_SOCKET):
+        super().__init__(name="control", daemon=True)
+        self.handlers = handlers
+        self.path = path
+        self._sock = self._bind(path)
+
+    @staticmethod
+    def _bind(path):
+        if os.path.exists(path):
+            try:
+                send_command("status", path, timeout=0.5)
+            except NOT_RUNNING:
+                os.unlink(path)  # left behind by a process that died
+            except OSError:
+                raise RuntimeError(f"Detector service already running on {path} (busy)")
+            else:
+                raise RuntimeError(f"Detector service already running on {path}")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(path)
+        sock.listen(4)
+        return sock
+
+    def run(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return  # socket closed by stop()
+            with conn:
+                try:
+                    conn.settimeout(2.0)
+                    with conn.makefile("rb") as request:
+                        command = request.readline().decode().strip().lower()
+                    conn.sendall(json.dumps(self._dispatch(command)).encode() + b"\n")
+                except OSError as e:
+                    print(f"⚠️ Control connection failed: {e}")
+
+    def _dispatch(self, command):
+        handler = self.handlers.get(command)
+        if handler is None:
+            return {"ok": False, "error": f"unknown command {command!r}, expected one of {', '.join(COMMANDS)}"}
+        try:
+            return {"ok": True, **handler()}
+        except Exception as e:
+            print(f"❌ Error handling {command}: {e}")
+            return {"ok": False, "error": str(e)}
+
+    def stop(self):
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)  # wakes up accept()
+        except OSError:
+            pass
+        self._sock.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""Resident product detector controlled over a local socket
+
+Loads the model, the catalog, the cart sync and the camera once and keeps
+them warm. The pipeline is then started, paused and resumed by commands on
+CONTROL_SOCKET (see control.py), which is what button_control.py sends:
+
+    python detector_service.py              # wait for "start"
+    python detector_service.py --start      # start detecting right away
+"""
+import argparse
+import signal
+import threading
+import time
+
+from control import ControlServer, CONTROL_SOCKET
+from metrics import start_metrics, METRICS_PORT
+from pipeline import format_rates, STATS_INTERVAL
+from preview import MjpegPreview, PREVIEW_HOST, PREVIEW_PORT
+
+
+class DetectorService:
+    """Owns the one detection pipeline and the camera it reads from
+
+    States: "loading" while the model and camera come up, then "ready",
+    "running" or "paused". A start requested while loading is applied as
+    soon as loading finishes.
+    """
+
+    def __init__(self, preview=None):
+        self.preview = preview
+        self.state = "loading"
+        self.app = None
+        self.detector = None
+        self.pipeline = None
+        self.cap = None
+        self.rates = ""
+        self.started = time.monotonic()
+        self._want_running = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        # Imported here so the control socket is already bound while the
+        # model loads; a second service exits instead of opening the camera
+        import raspberry_pi_detect_products as cart_app
+        self.app = cart_app
+        cap = cart_app.detector.start_system()
+        with self._lock:
+            # Only published once the cart sync exists, which status() reads
+            self.detector = cart_app.detector
+            self.cap = cap
+            self.pipeline = cart_app.DetectionPipeline(self.detector, self.cap, preview=self.preview)
+            self.state = "ready"
+            if self._want_running:
+                self._start()
+        print("✅ Detector service ready")
+
+    def _start(self):
+        self.pipeline.start()
+        self.state = "running"
+        print("▶️ Detection running")
+
+    def _pause(self):
+        self.pipeline.stop()
+        self.state = "paused"
+        print("⏸️ Detection paused")
+
+    def start(self):
+        with self._lock:
+            self._want_running = True
+            if self.pipeline and not self.pipeline.running:
+                self._start()
+            return self.status_locked()
+
+    resume = start
+
+    def pause(self):
+        with self._lock:
+            self._want_running = False
+            if self.pipeline and self.pipeline.running:
+                self._pause()
+            return self.status_locked()
+
+    def toggle(self):
+        with self._lock:
+            running = self.pipeline.running if self.pipeline else self._want_running
+        return self.pause() if running else self.start()
+
+    def status(self):
+        with self._lock:
+            return self.status_locked()
+
+    def status_locked(self):
+        status = {"state": self.state, "uptime": round(time.monotonic() - self.started, 1)}
+        if self.detector:
+            status["pending_sync"] = self.detector.cart_writer.pending_count()
+            status["frames"] = self.detector.motion_gate.stats()
+            status["rates"] = self.rates
+        return status
+
+    def handlers(self):
+        return {"start": self.start, "pause": self.pause, "resume": self.resume,
+                "toggle": self.toggle, "status": self.status}
+
+    def serve(self, shutdown):
+        """Forward preview frames and log rates until `shutdown` is set"""
+        last_report = time.monotonic()
+        while not shutdown.is_set():
+            frame = self.pipeline.annotated.get(timeout=0.5)
+            if frame is not None and self.preview:
+                self.preview.publish(frame)
+            if time.monotonic() - last_report >= STATS_INTERVAL:
+                with self._lock:
+                    if self.pipeline.running:
+                        self.rates = format_rates(self.pipeline.meters())
+                        print(f"📊 {self.rates} | {self.detector.motion_gate.stats()}")
+                last_report = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if self.pipeline:
+                self.pipeline.stop()
+        if self.detector:
+            self.detector.cart_writer.stop()
+            self.cap.release()
+        if self.app:
+            self.app.leds.stop()
+            self.app.GPIO.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--start", action="store_true", help="start detecting as soon as loaded")
+    parser.add_argument("--socket", default=CONTROL_SOCKET)
+    parser.add_argument("--preview", type=int, nargs="?", const=PREVIEW_PORT, metavar="PORT",
+                        help=f"serve an MJPEG preview over HTTP (default port {PREVIEW_PORT})")
+    parser.add_argument("--preview-host", default=PREVIEW_HOST,
+                        help=f"address the preview listens on (default {PREVIEW_HOST}, local only)")
+    parser.add_argument("--metrics", type=int, nargs="?", const=METRICS_PORT, metavar="PORT",
+                        help=f"serve latency metrics on /metrics (default port {METRICS_PORT})")
+    args = parser.parse_args()
+
+    preview = MjpegPreview(args.preview, args.preview_host).start() if args.preview else None
+    service = DetectorService(preview)
+    try:
+        control = ControlServer(service.handlers(), args.socket)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return
+    control.start()
+    print(f"🎛️ Control socket at {args.socket}")
+    _, metrics_server = start_metrics(args.metrics)
+
+    shutdown = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: shutdown.set())
+    if args.start:
+        service.start()
+    try:
+        service.load()
+        service.serve(shutdown)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        control.stop()
+        if metrics_server:
+            metrics_server.stop()
+        service.close()
+        if preview:
+            preview.stop()
+
+
+if __name__ == "__main__":
+    main()
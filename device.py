@@ -0,0 +1,35 @@
+import os
+import re
+import uuid
+from functools import lru_cache
+
+# Directory for this device's local state (cart ID, journal, counters), so
+# every process finds the same files whatever directory it was started from
+STATE_DIR = os.environ.get("SMART_CART_STATE_DIR") or os.path.dirname(os.path.abspath(__file__))
+# Where this device's generated cart ID is kept
+DEVICE_ID_PATH = os.path.join(STATE_DIR, ".device_id")
+# Store this cart belongs to; kiosks watch every cart of one store
+STORE_ID = os.environ.get("SMART_CART_STORE", "default")
+
+
+@lru_cache(maxsize=None)
+def device_id(path=DEVICE_ID_PATH):
+    """Stable cart ID for this device, used as its Firestore cart document ID
+
+    Taken from $SMART_CART_ID if set, otherwise generated once and kept in
+    `path`, so the camera process and the cart GUI on the same Pi agree.
+    """
+    cart_id = os.environ.get("SMART_CART_ID")
+    if not cart_id:
+        try:
+            with open(path) as f:
+                cart_id = f.read().strip()
+        except FileNotFoundError:
+            pass
+    if not cart_id:
+        cart_id = f"cart-{uuid.uuid4().hex[:12]}"
+        with open(path, "w") as f:
+            f.write(cart_id + "\n")
+        print(f"🆔 New cart ID {cart_id} saved to {path}")
+    # Document IDs cannot contain slashes
+    return re.sub(r"[^A-Za-z0-9_.-]", "-", cart_id)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Export honey.pt to ONNX, optionally quantize it to INT8 and check parity
+
+    python export_model.py                          # honey.onnx
+    python export_model.py --int8 --calib images/   # + honey_int8.onnx, if it passes
+    python export_model.py --check images/          # compare against PyTorch
+"""
+import argparse
+import glob
+import os
+import sys
+
+import cv2
+import numpy as np
+
+from inference import OnnxBackend, UltralyticsBackend, WEIGHTS, INFERENCE_SIZE
+from tracker import iou_matrix
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png", "*.bmp")
+# A detection "matches" when the same class overlaps at least this much
+PARITY_IOU = 0.5
+# Minimum share of PyTorch detections the ONNX model must reproduce
+PARITY_MIN_RECALL = 0.95
+
+
+def list_images(directory):
+    paths = []
+    for pattern in IMAGE_PATTERNS:
+        paths.extend(glob.glob(os.path.join(directory, pattern)))
+    return sorted(paths)
+
+
+def export_onnx(weights=WEIGHTS, imgsz=INFERENCE_SIZE):
+    """Export the PyTorch weights with ultralytics and return the ONNX path"""
+    from ultralytics import YOLO
+    path = YOLO(weights).export(format="onnx", imgsz=imgsz, simplify=True)
+    print(f"✅ Exported {weights} -> {path}")
+    return path
+
+
+class CalibrationReader:
+    """Feeds preprocessed calibration images to the ONNX Runtime quantizer"""
+
+    def __init__(self, backend, paths):
+        self.backend = backend
+        self.paths = iter(paths)
+
+    def get_next(self):
+        for path in self.paths:
+            frame = cv2.imread(path)
+            if frame is not None:
+                blob, _, _ = self.backend.preprocess(frame)
+                return {self.backend.input_name: blob}
+        return None
+
+
+def quantize_int8(fp32_path, calib_dir, output_path):
+    """Static INT8 quantization (QDQ) calibrated on real cart images"""
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    paths = list_images(calib_dir)
+    if not paths:
+        raise SystemExit(f"❌ No calibration images found in {calib_dir}")
+
+    prepared = fp32_path.replace(".onnx", "_prep.onnx")
+    quant_pre_process(fp32_path, prepared)
+    quantize_static(
+        prepared, output_path,
+        CalibrationReader(OnnxBackend(fp32_path), paths),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        calibrate_method=CalibrationMethod.MinMax,
+    )
+    os.remove(prepared)
+    print(f"✅ Quantized with {len(paths)} calibration images -> {output_path}")
+    return output_path
+
+
+def compare(reference, candidate):
+    """Match two Detections by class and IoU
+
+    Returns (matched, mean absolute confidence difference).
+    """
+    if not len(reference) or not len(candidate):
+        return 0, 0.0
+    iou = iou_matrix(reference.boxes.astype(np.float32), candidate.boxes.astype(np.float32))
+    used = set()
+    matched = 0
+    conf_diff = 0.0
+    for i, (conf, class_id) in enumerate(zip(reference.confs, reference.class_ids)):
+        for j in np.argsort(-iou[i]):
+            if iou[i, j] < PARITY_IOU:
+                break
+            if j not in used and candidate.class_ids[j] == class_id:
+                used.add(j)
+                matched += 1
+                conf_diff += abs(float(conf) - float(candidate.confs[j]))
+                break
+    return matched, conf_diff / matched if matched else 0.0
+
+
+def check_parity(onnx_path, image_dir, weights=WEIGHTS):
+    """Compare ONNX detections with PyTorch on a folder of images"""
+    paths = list_images(image_dir)
+    if not paths:
+        raise SystemExit(f"❌ No images found in {image_dir}")
+    reference = UltralyticsBackend(weights)
+    candidate = OnnxBackend(onnx_path, names=reference.names)
+    # Compare at the resolution the ONNX model was exported at
+    reference.imgsz = candidate.imgsz
+
+    ref_total = cand_total = matched = 0
+    conf_diff = 0.0
+    for path in paths:
+        frame = cv2.imread(path)
+        if frame is None:
+            continue
+        ref = reference.detect(frame)
+        ref = ref.select(ref.confs >= candidate.conf_threshold)
+        cand = candidate.detect(frame)
+        hits, diff = compare(ref, cand)
+        ref_total += len(ref)
+        cand_total += len(cand)
+        matched += hits
+        conf_diff += diff * hits
+
+    recall = matched / ref_total if ref_total else 1.0
+    precision = matched / cand_total if cand_total else 1.0
+    mean_diff = conf_diff / matched if matched else 0.0
+    print(f"📏 {onnx_path} vs {weights} on {len(paths)} images: "
+          f"recall {recall:.3f}, precision {precision:.3f}, mean |Δconf| {mean_diff:.3f}")
+    return recall >= PARITY_MIN_RECALL
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", default=WEIGHTS)
+    parser.add_argument("--imgsz", type=int, default=INFERENCE_SIZE)
+    parser.add_argument("--int8", action="store_true", help="also write an INT8 model")
+    parser.add_argument("--calib", help="directory of calibration images for --int8 "
+                        "(also used for its parity check without --check)")
+    parser.add_argument("--check", metavar="DIR", help="check parity against PyTorch on these images")
+    args = parser.parse_args()
+    if args.int8 and not args.calib:
+        parser.error("--int8 needs --calib DIR")
+
+    base = os.path.splitext(args.weights)[0]
+    fp32_path = base + ".onnx"
+    if not os.path.exists(fp32_path) or not args.check:
+        fp32_path = export_onnx(args.weights, args.imgsz)
+
+    if args.check and not check_parity(fp32_path, args.check, args.weights):
+        print(f"❌ Parity below {PARITY_MIN_RECALL:.0%} recall, keep using the PyTorch model")
+        sys.exit(1)
+
+    if args.int8:
+        # load_backend() picks the INT8 model first, so it is only written
+        # under its real name once it has passed the parity check
+        int8_path = base + "_int8.onnx"
+        unchecked = base + "_int8.unchecked.onnx"
+        quantize_int8(fp32_path, args.calib, unchecked)
+        if not check_parity(unchecked, args.check or args.calib, args.weights):
+            os.remove(unchecked)
+            if os.path.exists(int8_path):
+                # Quantized from older weights, so it no longer matches either
+                os.remove(int8_path)
+            print(f"❌ INT8 parity below {PARITY_MIN_RECALL:.0%} recall, INT8 model discarded")
+            sys.exit(1)
+        os.replace(unchecked, int8_path)
+        print(f"✅ {int8_path} passed the parity check")
+    elif args.check:
+        print("✅ Parity check passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from device import STATE_DIR, device_id
+
+# Local counters, one row per counter name
+COUNTER_PATH = os.path.join(STATE_DIR, "id_counters.db")
+# GS1 reserves EAN-13 codes starting with 2 for in-store numbering, so
+# generated barcodes never clash with a manufacturer's code
+IN_STORE_PREFIX = "2"
+
+
+def ean13_check_digit(body):
+    """Check digit for the first 12 digits of an EAN-13 code"""
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(body))
+    return str((10 - total % 10) % 10)
+
+
+def is_ean13(code):
+    code = str(code)
+    return len(code) == 13 and code.isdigit() and ean13_check_digit(code[:12]) == code[12]
+
+
+def ean13(number, prefix=IN_STORE_PREFIX):
+    """Valid EAN-13 barcode for `number` within the in-store range"""
+    body = f"{prefix}{number:0{12 - len(prefix)}d}"
+    if len(body) != 12:
+        raise ValueError(f"{number} does not fit in an EAN-13 code with prefix {prefix}")
+    return body + ean13_check_digit(body)
+
+
+def in_store_barcodes(existing, prefix=IN_STORE_PREFIX):
+    """Yield fresh in-store EAN-13 barcodes numbered after the highest in `existing`
+
+    The catalog itself is the counter: numbering continues from the largest
+    generated barcode already in use, so re-imports never hand out a code twice.
+    """
+    used = [int(code[len(prefix):12]) for code in map(str, existing)
+            if is_ean13(code) and code.startswith(prefix)]
+    number = max(used, default=0)
+    while True:
+        number += 1
+        yield ean13(number, prefix)
+
+
+class Counter:
+    """Monotonic counter persisted in a local SQLite file
+
+    Incrementing is a single local transaction, so processes on the same
+    device never get the same value and no network round trip is needed.
+    """
+
+    def __init__(self, name, path=COUNTER_PATH):
+        self.name = name
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def next(self):
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, serializing other processes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT INTO counters (name, value) VALUES (?, 1) "
+                    "ON CONFLICT (name) DO UPDATE SET value = value + 1", (self.name,))
+                value = self._conn.execute(
+                    "SELECT value FROM counters WHERE name = ?", (self.name,)).fetchone()[0]
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return value
+
+    def close(self):
+        self._conn.close()
+
+
+class InvoiceNumbers:
+    """Invoice numbers unique across devices without a shared counter
+
+    Numbers look like INV-20260117-cart-1a2b3c4d5e6f-000042: the date, the ID
+    of the device issuing the invoice and a per-device sequence that never goes
+    back, so two devices can never issue the same number and none of them
+    needs Firestore.
+    """
+
+    def __init__(self, issuer=None, path=COUNTER_PATH):
+        self.issuer = issuer or device_id()
+        self._counter = Counter(f"invoice:{self.issuer}", path)
+
+    def next(self):
+        return f"INV-{datetime.now().strftime('%Y%m%d')}-{self.issuer}-{self._counter.next():06d}"
@@ -0,0 +1,259 @@
+import ast
+import os
+import time
+
+import cv2
+import numpy as np
+
+from tracker import iou_matrix
+
+# Which backend load_backend() uses: "auto", "onnx" or "ultralytics".
+# "auto" picks ONNX Runtime when an exported model is present.
+DETECTOR_BACKEND = "auto"
+WEIGHTS = "honey.pt"
+# Exported models, preferred in this order
+ONNX_MODELS = ["honey_int8.onnx", "honey.onnx"]
+# Side the (cropped) frame is letterboxed to before inference. Cost scales
+# with pixel count, so 320 runs about 4x faster than the default 640.
+INFERENCE_SIZE = 320
+# Detections below this confidence are discarded before NMS
+CONF_THRESHOLD = 0.25
+NMS_IOU = 0.45
+# Boxes of different classes overlapping this much are one item seen twice
+DUPLICATE_IOU = 0.7
+
+
+class Detections:
+    """One frame of detections as parallel arrays, highest confidence first
+
+    `boxes` is an (N, 4) int32 xyxy array, `confs` and `class_ids` are (N,)
+    arrays. Iterating yields (conf, class_id, (x1, y1, x2, y2)) tuples for
+    code that handles one detection at a time.
+    """
+
+    __slots__ = ("boxes", "confs", "class_ids")
+
+    def __init__(self, boxes, confs, class_ids):
+        confs = np.asarray(confs, dtype=np.float32).reshape(-1)
+        order = np.argsort(-confs, kind="stable")
+        self.boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)[order]
+        self.confs = confs[order]
+        self.class_ids = np.asarray(class_ids, dtype=np.int64).reshape(-1)[order]
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, 4)), np.zeros(0), np.zeros(0))
+
+    def __len__(self):
+        return len(self.confs)
+
+    def __iter__(self):
+        return zip(self.confs.tolist(), self.class_ids.tolist(), map(tuple, self.boxes.tolist()))
+
+    def select(self, index):
+        """Subset by boolean mask or index array, keeping the order"""
+        return Detections(self.boxes[index], self.confs[index], self.class_ids[index])
+
+    def deduplicated(self, iou_threshold=DUPLICATE_IOU):
+        """Drop boxes that cover the same item as a more confident box
+
+        NMS runs per class, so one item the model is unsure about can come
+        back as two boxes with different classes; this keeps only the most
+        confident one, so the item is not tracked and added twice.
+        """
+        if len(self) < 2:
+            return self
+        keep = nms(self.boxes.astype(np.float32), self.confs, iou_threshold)
+        if len(keep) == len(self):
+            return self
+        return self.select(np.sort(keep))
+
+    def shifted(self, dx, dy):
+        """Same detections with the boxes moved by (dx, dy)"""
+        return Detections(self.boxes + np.array([dx, dy, dx, dy], dtype=np.int32),
+                          self.confs, self.class_ids)
+
+
+class UltralyticsBackend:
+    """PyTorch inference through ultralytics, as the scripts always did
+
+    Like every backend, `timings` holds the preprocess/inference/postprocess
+    split of the last detect() call, in seconds.
+    """
+
+    name = "ultralytics"
+
+    def __init__(self, weights=WEIGHTS, imgsz=INFERENCE_SIZE, conf_threshold=CONF_THRESHOLD):
+        from ultralytics import YOLO
+        self.model = YOLO(weights)
+        self.names = self.model.names
+        self.imgsz = imgsz
+        self.conf_threshold = conf_threshold
+        self.timings = {}
+
+    def detect(self, frame):
+        """Detections for one frame, highest confidence first"""
+        result = self.model(frame, imgsz=self.imgsz, conf=self.conf_threshold, verbose=False)[0]
+        started = time.perf_counter()
+        # One device->host copy per field for the whole frame
+        boxes = result.boxes
+        detections = Detections(boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(),
+                                boxes.cls.cpu().numpy())
+        # ultralytics reports its own split in milliseconds
+        speed = result.speed
+        self.timings = {
+            "preprocess": speed["preprocess"] / 1000,
+            "inference": speed["inference"] / 1000,
+            "postprocess": speed["postprocess"] / 1000 + time.perf_counter() - started,
+        }
+        return detections
+
+
+def letterbox(image, size, color=(114, 114, 114)):
+    """Resize keeping the aspect ratio and pad to size x size
+
+    Returns the padded image, the scale factor and the (x, y) padding, which
+    is what is needed to map boxes back to the original image.
+    """
+    height, width = image.shape[:2]
+    scale = min(size / height, size / width)
+    new_w, new_h = int(round(width * scale)), int(round(height * scale))
+    if (new_w, new_h) != (width, height):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    pad_x = (size - new_w) // 2
+    pad_y = (size - new_h) // 2
+    image = cv2.copyMakeBorder(image, pad_y, size - new_h - pad_y, pad_x, size - new_w - pad_x,
+                               cv2.BORDER_CONSTANT, value=color)
+    return image, scale, (pad_x, pad_y)
+
+
+def nms(boxes, scores, iou_threshold=NMS_IOU):
+    """Indices of the boxes kept by greedy non-maximum suppression"""
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size:
+        best = order[0]
+        keep.append(best)
+        if order.size == 1:
+            break
+        overlap = iou_matrix(boxes[best:best + 1], boxes[order[1:]])[0]
+        order = order[1:][overlap <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def batched_nms(boxes, scores, class_ids, iou_threshold=NMS_IOU):
+    """Per-class NMS: boxes of different classes never suppress each other"""
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    # Shift each class into its own coordinate range, then run one NMS
+    offsets = class_ids[:, None].astype(np.float32) * (boxes.max() + 1)
+    return nms(boxes + offsets, scores, iou_threshold)
+
+
+def decode_yolo(output, num_classes, conf_threshold=CONF_THRESHOLD, iou_threshold=NMS_IOU):
+    """Turn a raw YOLO head output into (boxes xyxy, scores, class_ids)
+
+    Handles the YOLOv8 layout (4 + classes, anchors) as well as the YOLOv5
+    layout (anchors, 5 + classes) with an objectness column.
+    """
+    pred = np.squeeze(output, axis=0)
+    if pred.shape[0] == 4 + num_classes:
+        pred = pred.T
+        class_scores = pred[:, 4:]
+    else:
+        class_scores = pred[:, 5:] * pred[:, 4:5]
+    class_ids = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(class_scores)), class_ids]
+
+    mask = scores >= conf_threshold
+    xywh = pred[mask, :4]
+    scores = scores[mask]
+    class_ids = class_ids[mask]
+
+    boxes = np.empty_like(xywh)
+    boxes[:, 0] = xywh[:, 0] - xywh[:, 2] / 2
+    boxes[:, 1] = xywh[:, 1] - xywh[:, 3] / 2
+    boxes[:, 2] = xywh[:, 0] + xywh[:, 2] / 2
+    boxes[:, 3] = xywh[:, 1] + xywh[:, 3] / 2
+
+    keep = batched_nms(boxes, scores, class_ids, iou_threshold)
+    return boxes[keep], scores[keep], class_ids[keep]
+
+
+class OnnxBackend:
+    """ONNX Runtime CPU inference with NumPy decoding and NMS
+
+    Works with FP32 and INT8-quantized exports of honey.pt, and never imports
+    torch, which keeps startup on the Pi short.
+    """
+
+    name = "onnx"
+
+    def __init__(self, path, names=None, conf_threshold=CONF_THRESHOLD, iou_threshold=NMS_IOU):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = os.cpu_count() or 4
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.imgsz = self.session.get_inputs()[0].shape[2]
+        self.names = names or self._names_from_metadata()
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.path = path
+        self.timings = {}
+
+    def _names_from_metadata(self):
+        # ultralytics stores the class names in the exported model's metadata
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        if "names" not in metadata:
+            raise ValueError("ONNX model has no class names in its metadata, pass names=")
+        return ast.literal_eval(metadata["names"])
+
+    def preprocess(self, frame):
+        image, scale, pad = letterbox(frame, self.imgsz)
+        blob = cv2.dnn.blobFromImage(image, 1 / 255.0, swapRB=True)
+        return blob, scale, pad
+
+    def detect(self, frame):
+        """Detections for one frame, highest confidence first"""
+        started = time.perf_counter()
+        blob, scale, (pad_x, pad_y) = self.preprocess(frame)
+        preprocessed = time.perf_counter()
+        output = self.session.run(None, {self.input_name: blob})[0]
+        inferred = time.perf_counter()
+        boxes, scores, class_ids = decode_yolo(output, len(self.names),
+                                               self.conf_threshold, self.iou_threshold)
+
+        # Undo the letterbox and clip to the frame
+        height, width = frame.shape[:2]
+        boxes[:, [0, 2]] = np.clip((boxes[:, [0, 2]] - pad_x) / scale, 0, width)
+        boxes[:, [1, 3]] = np.clip((boxes[:, [1, 3]] - pad_y) / scale, 0, height)
+        detections = Detections(boxes, scores, class_ids)
+        self.timings = {
+            "preprocess": preprocessed - started,
+            "inference": inferred - preprocessed,
+            "postprocess": time.perf_counter() - inferred,
+        }
+        return detections
+
+
+def load_backend(backend=DETECTOR_BACKEND, weights=WEIGHTS):
+    """Create the configured inference backend"""
+    if backend in ("auto", "onnx"):
+        for path in ONNX_MODELS:
+            if os.path.exists(path):
+                try:
+                    detector = OnnxBackend(path)
+                    print(f"🧠 Using ONNX Runtime backend ({path})")
+                    return detector
+                except ImportError:
+                    if backend == "onnx":
+                        raise
+                    print("⚠️ onnxruntime not installed, falling back to PyTorch")
+                    break
+        else:
+            if backend == "onnx":
+                raise FileNotFoundError(f"No exported model found, tried {', '.join(ONNX_MODELS)}")
+    print(f"🧠 Using PyTorch backend ({weights})")
+    return UltralyticsBackend(weights)
@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import deque
+
+from metrics import span
+
+
+class MockGPIO:
+    """Stand-in for RPi.GPIO on machines without GPIO pins
+
+    Keeps the current level of every pin and a history of writes so LED and
+    button behaviour can be checked on a plain Linux box.
+    """
+
+    BCM = "BCM"
+    BOARD = "BOARD"
+    IN = "IN"
+    OUT = "OUT"
+    HIGH = 1
+    LOW = 0
+    PUD_UP = "PUD_UP"
+    PUD_DOWN = "PUD_DOWN"
+    FALLING = "FALLING"
+    RISING = "RISING"
+    BOTH = "BOTH"
+
+    def __init__(self):
+        self.levels = {}
+        self.writes = []
+        self.callbacks = {}
+
+    def setmode(self, mode):
+        pass
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=None, initial=None):
+        self.levels.setdefault(pin, self.LOW if pull_up_down != self.PUD_UP else self.HIGH)
+
+    def output(self, pin, level):
+        self.levels[pin] = level
+        self.writes.append((time.monotonic(), pin, level))
+
+    def input(self, pin):
+        return self.levels.get(pin, self.LOW)
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        self.callbacks[pin] = callback
+
+    def remove_event_detect(self, pin):
+        self.callbacks.pop(pin, None)
+
+    def cleanup(self):
+        self.levels.clear()
+
+
+def load_gpio():
+    """RPi.GPIO when running on a Pi, otherwise a MockGPIO"""
+    try:
+        import RPi.GPIO as GPIO
+        return GPIO
+    except (ImportError, RuntimeError):
+        print("⚠️ RPi.GPIO not available, using mock GPIO")
+        return MockGPIO()
+
+
+class LedController(threading.Thread):
+    """Drive status LEDs from a worker thread
+
+    Commands are fire-and-forget and never sleep on the caller's thread. A new
+    command for a pin replaces whatever that pin was still doing, so repeated
+    blinks coalesce, and writes that would not change a pin's level are skipped.
+    """
+
+    def __init__(self, gpio, pins):
+        super().__init__(name="leds", daemon=True)
+        self.gpio = gpio
+        self.pins = list(pins)
+        self._cond = threading.Condition()
+        self._steps = {}       # pin -> deque of (level, duration or None)
+        self._deadlines = {}   # pin -> when the next step is due
+        self._levels = {}      # pin -> last level written
+        self._stopped = False
+        for pin in self.pins:
+            self.gpio.setup(pin, self.gpio.OUT)
+            self._write(pin, self.gpio.LOW)
+
+    def blink(self, pin, duration=0.5):
+        """Turn an LED on for `duration` seconds"""
+        self._submit(pin, [(self.gpio.HIGH, duration), (self.gpio.LOW, None)])
+
+    def pulse(self, pin, count=3, on_time=0.1, off_time=0.1):
+        """Flash an LED `count` times"""
+        steps = []
+        for _ in range(count):
+            steps += [(self.gpio.HIGH, on_time), (self.gpio.LOW, off_time)]
+        self._submit(pin, steps)
+
+    def on(self, pin):
+        self._submit(pin, [(self.gpio.HIGH, None)])
+
+    def off(self, pin):
+        self._submit(pin, [(self.gpio.LOW, None)])
+
+    def set(self, pin, lit):
+        """Steady on/off; a no-op if the pin is already there and idle"""
+        level = self.gpio.HIGH if lit else self.gpio.LOW
+        with self._cond:
+            if pin not in self._steps and self._levels.get(pin) == level:
+                return
+        self._submit(pin, [(level, None)])
+
+    def stop(self):
+        """Finish the worker and switch every LED off"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self.is_alive():
+            self.join(timeout=1.0)
+        for pin in self.pins:
+            self._write(pin, self.gpio.LOW)
+
+    def _submit(self, pin, steps):
+        with self._cond:
+            self._steps[pin] = deque(steps)
+            self._deadlines[pin] = 0.0
+            self._cond.notify()
+
+    def _write(self, pin, level):
+        if self._levels.get(pin) != level:
+            with span("leds.write"):
+                self.gpio.output(pin, level)
+            self._levels[pin] = level
+
+    def run(self):
+        with self._cond:
+            while not self._stopped:
+                now = time.monotonic()
+                for pin in list(self._steps):
+                    steps = self._steps[pin]
+                    while self._deadlines[pin] <= now:
+                        level, duration = steps.popleft()
+                        self._write(pin, level)
+                        if duration is None or not steps:
+                            # Steady state reached, nothing left to schedule
+                            del self._steps[pin], self._deadlines[pin]
+                            break
+                        self._deadlines[pin] = now + duration
+                timeout = min(self._deadlines.values()) - now if self._deadlines else None
+                self._cond.wait(timeout)
@@ -0,0 +1,392 @@
+"""Low-overhead latency metrics for the detector and the cart app
+
+    from metrics import span, timed
+
+    with span("detect"):
+        detections = model.detect(frame)
+
+Every span name gets a log-linear (HDR-style) histogram. Recording never
+takes a lock: each thread writes to its own shard and readers merge them.
+start_metrics() adds a periodic compact log line, an optional /metrics
+endpoint in Prometheus text format and a sampling profiler that can be
+switched on at runtime (SIGUSR1 or POST /profile/start).
+"""
+import collections
+import os
+import signal
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local only: the profiler controls write files on the cart
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+# How often the compact metrics line is printed (seconds)
+METRICS_LOG_INTERVAL = 30.0
+# Spans shown in the log line, slowest p99 first
+LOG_TOP_SPANS = 6
+# Seconds between profiler samples
+PROFILE_INTERVAL = 0.005
+PROFILE_MAX_DEPTH = 64
+
+# Histogram resolution: 2**SUB_BITS linear sub-buckets per power of two
+# (about 1.5% relative error), values in microseconds up to 2**MAX_BITS
+SUB_BITS = 7
+MAX_BITS = 36
+_HALF = 1 << (SUB_BITS - 1)
+_BUCKETS = (MAX_BITS - SUB_BITS + 1) * _HALF + (1 << SUB_BITS)
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _bucket(value):
+    if value < (1 << SUB_BITS):
+        return value
+    shift = min(value.bit_length(), MAX_BITS) - SUB_BITS
+    return shift * _HALF + min(value >> shift, (1 << SUB_BITS) - 1)
+
+
+def _bucket_value(index):
+    """Midpoint (in microseconds) of the values that land in a bucket"""
+    if index < (1 << SUB_BITS):
+        return index
+    shift = index // _HALF - 1
+    low = (index - shift * _HALF) << shift
+    return low + ((1 << shift) - 1) / 2
+
+
+def quantile_from_counts(counts, total, q):
+    """Value (microseconds) at quantile `q` of a bucket count list"""
+    if not total:
+        return 0.0
+    rank = max(1, int(q * total + 0.5))
+    seen = 0
+    for index, count in enumerate(counts):
+        seen += count
+        if seen >= rank:
+            return _bucket_value(index)
+    return _bucket_value(len(counts) - 1)
+
+
+class _Shard:
+    __slots__ = ("counts", "total", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * _BUCKETS
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+
+class Histogram:
+    """Latency histogram with one shard per recording thread"""
+
+    def __init__(self, name):
+        self.name = name
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()  # only taken when a new thread first records
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def record_us(self, micros):
+        micros = int(micros)
+        shard = self._shard()
+        shard.counts[_bucket(micros)] += 1
+        shard.total += 1
+        shard.sum += micros
+        if micros > shard.max:
+            shard.max = micros
+
+    def record(self, seconds):
+        self.record_us(seconds * 1e6)
+
+    def snapshot(self):
+        """Merged (counts, total, sum_us, max_us) across all threads"""
+        with self._lock:
+            shards = list(self._shards)
+        counts = [0] * _BUCKETS
+        total = sum_us = max_us = 0
+        for shard in shards:
+            for index, count in enumerate(shard.counts):
+                if count:
+                    counts[index] += count
+            total += shard.total
+            sum_us += shard.sum
+            max_us = max(max_us, shard.max)
+        return counts, total, sum_us, max_us
+
+
+_histograms = {}
+_registry_lock = threading.Lock()
+
+
+def histogram(name):
+    hist = _histograms.get(name)
+    if hist is None:
+        with _registry_lock:
+            hist = _histograms.setdefault(name, Histogram(name))
+    return hist
+
+
+class span:
+    """Context manager timing a block into the histogram `name`"""
+
+    __slots__ = ("hist", "started")
+
+    def __init__(self, name):
+        self.hist = histogram(name)
+
+    def __enter__(self):
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.record_us((time.perf_counter_ns() - self.started) // 1000)
+        return False
+
+
+def timed(name):
+    """Decorator form of span()"""
+    def decorate(func):
+        hist = histogram(name)
+
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                hist.record_us((time.perf_counter_ns() - started) // 1000)
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+    return decorate
+
+
+def record(name, seconds):
+    """Record a duration measured elsewhere"""
+    histogram(name).record(seconds)
+
+
+def record_all(prefix, timings):
+    """Record a {stage: seconds} dict such as a backend's `timings`"""
+    for stage, seconds in timings.items():
+        histogram(f"{prefix}.{stage}").record(seconds)
+
+
+def render_prometheus():
+    """All histograms in Prometheus text exposition format"""
+    lines = [
+        "# HELP smart_cart_span_seconds Time spent in each instrumented span",
+        "# TYPE smart_cart_span_seconds summary",
+    ]
+    maxima = []
+    for name in sorted(_histograms):
+        counts, total, sum_us, max_us = _histograms[name].snapshot()
+        for q in QUANTILES:
+            value = quantile_from_counts(counts, total, q) / 1e6
+            lines.append(f'smart_cart_span_seconds{{span="{name}",quantile="{q}"}} {value:.6f}')
+        lines.append(f'smart_cart_span_seconds_sum{{span="{name}"}} {sum_us / 1e6:.6f}')
+        lines.append(f'smart_cart_span_seconds_count{{span="{name}"}} {total}')
+        maxima.append(f'smart_cart_span_max_seconds{{span="{name}"}} {max_us / 1e6:.6f}')
+    lines += ["# HELP smart_cart_span_max_seconds Slowest recorded span",
+              "# TYPE smart_cart_span_max_seconds gauge"] + maxima
+    return "\n".join(lines) + "\n"
+
+
+class MetricsLogger(threading.Thread):
+    """Print one compact line per interval with p50/p99 of the busiest spans
+
+    Percentiles cover only the spans recorded since the previous line.
+    """
+
+    def __init__(self, interval=METRICS_LOG_INTERVAL, top=LOG_TOP_SPANS):
+        super().__init__(name="metrics-log", daemon=True)
+        self.interval = interval
+        self.top = top
+        self._previous = {}
+        self._stop_event = threading.Event()
+
+    def line(self):
+        parts = []
+        for name in list(_histograms):
+            counts, total, _, _ = _histograms[name].snapshot()
+            before_counts, before_total = self._previous.get(name, (None, 0))
+            self._previous[name] = (counts, total)
+            delta = total - before_total
+            if not delta:
+                continue
+            if before_counts:
+                counts = [now - then for now, then in zip(counts, before_counts)]
+            p50 = quantile_from_counts(counts, delta, 0.5) / 1000
+            p99 = quantile_from_counts(counts, delta, 0.99) / 1000
+            parts.append((p99, f"{name} {p50:.1f}/{p99:.1f}ms ×{delta}"))
+        parts.sort(reverse=True)
+        return " | ".join(text for _, text in parts[:self.top])
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            line = self.line()
+            if line:
+                print(f"⏱️ p50/p99 {line}")
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class SamplingProfiler(threading.Thread):
+    """Sample every thread's stack at a fixed interval
+
+    The samples are kept as collapsed stacks ("thread;outer;inner count"),
+    which flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        super().__init__(name="profiler", daemon=True)
+        self.interval = interval
+        self.samples = collections.Counter()
+        self.started = time.monotonic()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        names = {}
+        while not self._stop_event.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < PROFILE_MAX_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join(1.0)
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def top(self, count=10):
+        """Leaf functions with the most samples"""
+        leaves = collections.Counter()
+        for stack, hits in list(self.samples.items()):
+            leaves[stack.rsplit(";", 1)[-1]] += hits
+        return leaves.most_common(count)
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def start_profiler(interval=PROFILE_INTERVAL):
+    global _profiler
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = SamplingProfiler(interval)
+            _profiler.start()
+            print("🔬 Sampling profiler started")
+        return _profiler
+
+
+def stop_profiler(path=None):
+    """Stop the profiler, save the collapsed stacks and return the profiler"""
+    global _profiler
+    with _profiler_lock:
+        profiler, _profiler = _profiler, None
+    if profiler is None:
+        return None
+    profiler.stop()
+    path = path or time.strftime("profile-%Y%m%d-%H%M%S.folded")
+    with open(path, "w") as f:
+        f.write(profiler.collapsed())
+    total = sum(profiler.samples.values()) or 1
+    print(f"🔬 Profiler stopped after {time.monotonic() - profiler.started:.1f}s, stacks saved to {path}")
+    for leaf, hits in profiler.top(5):
+        print(f"   {100.0 * hits / total:5.1f}% {leaf}")
+    return profiler
+
+
+def toggle_profiler(*_):
+    if _profiler is None:
+        start_profiler()
+    else:
+        stop_profiler()
+
+
+class MetricsServer:
+    """HTTP endpoint serving /metrics and the profiler controls"""
+
+    def __init__(self, port=METRICS_PORT, host=METRICS_HOST):
+        self.address = (host, port)
+        self._server = None
+
+    def start(self):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    self._reply(render_prometheus(), "text/plain; version=0.0.4")
+                elif self.path in ("/profile/start", "/profile/stop"):
+                    self.send_error(405, "Use POST")
+                elif self.path == "/profile":
+                    profiler = _profiler
+                    self._reply(profiler.collapsed() if profiler else "profiler not running\n")
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                # State changes only on POST, so a crawler or prefetch cannot trigger them
+                if self.path == "/profile/start":
+                    start_profiler()
+                    self._reply("profiler started\n")
+                elif self.path == "/profile/stop":
+                    profiler = stop_profiler()
+                    self._reply(profiler.collapsed() if profiler else "profiler not running\n")
+                else:
+                    self.send_error(404)
+
+            def _reply(self, body, content_type="text/plain"):
+                body = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(self.address, Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+        print(f"📈 Metrics at http://{self.address[0]}:{self._server.server_port}/metrics")
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def start_metrics(port=None, log_interval=METRICS_LOG_INTERVAL):
+    """Start the periodic log line, the /metrics endpoint if `port` is given,
+    and the SIGUSR1 profiler toggle. Returns the started (logger, server).
+    """
+    logger = MetricsLogger(log_interval)
+    logger.start()
+    server = MetricsServer(port).start() if port else None
+    if hasattr(signal, "SIGUSR1") and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1, toggle_profiler)
+    return logger, server
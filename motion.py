@@ -0,0 +1,61 @@
+import cv2
+import numpy as np
+
+# Width the frame is shrunk to before comparing (pixels)
+MOTION_WIDTH = 160
+# Per-pixel grey level change that counts as "changed"
+PIXEL_THRESHOLD = 25
+# Fraction of changed pixels that counts as a scene change
+MIN_CHANGED_FRACTION = 0.01
+
+
+class MotionGate:
+    """Decide cheaply whether a frame is worth running YOLO on
+
+    Each frame is shrunk to `width` pixels wide, converted to grey and blurred,
+    then compared with the frame the model last ran on. If less than
+    `min_changed` of the pixels moved by more than `pixel_threshold` the scene
+    is considered unchanged and inference can be skipped.
+    """
+
+    def __init__(self, width=MOTION_WIDTH, pixel_threshold=PIXEL_THRESHOLD,
+                 min_changed=MIN_CHANGED_FRACTION):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.reference = None
+        self.frames_inferred = 0
+        self.frames_skipped = 0
+
+    def _small(self, frame):
+        height = max(1, frame.shape[0] * self.width // frame.shape[1])
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def changed_fraction(self, small):
+        """Fraction of pixels that differ from the reference frame"""
+        if self.reference is None or self.reference.shape != small.shape:
+            return 1.0
+        diff = cv2.absdiff(small, self.reference)
+        return np.count_nonzero(diff > self.pixel_threshold) / diff.size
+
+    def should_infer(self, frame, force=False):
+        """True if the scene changed since the last inference (or `force`)
+
+        Pass `force=True` while the tracker still has items waiting to be
+        confirmed, so they get the frames they need.
+        """
+        small = self._small(frame)
+        if force or self.changed_fraction(small) >= self.min_changed:
+            self.reference = small
+            self.frames_inferred += 1
+            return True
+        self.frames_skipped += 1
+        return False
+
+    def stats(self):
+        total = self.frames_inferred + self.frames_skipped
+        skipped = 100.0 * self.frames_skipped / total if total else 0.0
+        return f"inferred {self.frames_inferred}, skipped {self.frames_skipped} ({skipped:.0f}%)"
@@ -0,0 +1,30 @@
+import cv2
+import numpy as np
+
+
+def draw_detections(frame, detections, table, track_ids=None):
+    """Draw labelled bounding boxes for a whole frame of detections
+
+    Labels and colors come from `table` (a ClassTable) with one array index,
+    and boxes of the same color are drawn with a single polylines call.
+    """
+    if not len(detections):
+        return frame
+    colors = table.colors[detections.class_ids]
+    names = table.names[detections.class_ids]
+    boxes = detections.boxes
+
+    # Each box as a closed 4-point polygon
+    corners = boxes[:, [0, 1, 2, 1, 2, 3, 0, 3]].reshape(-1, 4, 2)
+    for color in np.unique(colors, axis=0):
+        same = (colors == color).all(axis=1)
+        cv2.polylines(frame, list(corners[same]), True, tuple(color.tolist()), 2)
+
+    if track_ids is None:
+        track_ids = [0] * len(boxes)
+    for name, conf, track_id, (x1, y1), color in zip(
+            names, detections.confs.tolist(), list(track_ids), boxes[:, :2].tolist(),
+            colors.tolist()):
+        label = f"{name} {conf:.2f}" + (f" #{track_id}" if track_id else "")
+        cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+    return frame
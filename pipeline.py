@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import deque
+
+from metrics import span
+
+# How often each stage's frame rate is reported (seconds)
+STATS_INTERVAL = 5.0
+
+
+class LatestQueue:
+    """Bounded queue that drops the oldest item instead of blocking the producer"""
+
+    def __init__(self, maxsize=1):
+        self._items = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        """Store an item, discarding the oldest one if the queue is full"""
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Return the oldest pending item, or None if nothing arrives in time"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout):
+                return None
+            return self._items.popleft()
+
+
+class WorkQueue:
+    """Unbounded FIFO for items that must never be dropped, like cart deltas"""
+
+    def __init__(self):
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item):
+        with self._cond:
+            self._items.append(item)
+            self._cond.notify()
+
+    def requeue(self, item):
+        """Put an item that could not be handled back at the front"""
+        with self._cond:
+            self._items.appendleft(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Return the oldest pending item, or None if nothing arrives in time"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout):
+                return None
+            return self._items.popleft()
+
+
+class FpsMeter:
+    """Count processed items and report the rate since the last reading"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._count = 0
+        self._since = time.monotonic()
+
+    def tick(self):
+        with self._lock:
+            self._count += 1
+
+    def read(self):
+        """Return items per second since the previous read and reset the counter"""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._since
+            rate = self._count / elapsed if elapsed > 0 else 0.0
+            self._count = 0
+            self._since = now
+        return rate
+
+
+class CaptureThread(threading.Thread):
+    """Read camera frames continuously, keeping only the newest one"""
+
+    def __init__(self, cap, outbox, stop_event):
+        super().__init__(name="capture", daemon=True)
+        self.cap = cap
+        self.outbox = outbox
+        self.stop_event = stop_event
+        self.fps = FpsMeter()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            with span("camera.read"):
+                ret, frame = self.cap.read()
+            if not ret:
+                print("Failed to grab frame, retrying...")
+                time.sleep(0.1)
+                continue
+            self.outbox.put(frame)
+            self.fps.tick()
+
+
+class Stage(threading.Thread):
+    """Pipeline stage that applies `work` to each item from `inbox`
+
+    Non-None results are forwarded to `outbox` when one is given.
+    """
+
+    def __init__(self, name, work, inbox, outbox=None, stop_event=None):
+        super().__init__(name=name, daemon=True)
+        self.work = work
+        self.inbox = inbox
+        self.outbox = outbox
+        self.stop_event = stop_event or threading.Event()
+        self.fps = FpsMeter()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            item = self.inbox.get(timeout=0.1)
+            if item is None:
+                continue
+            try:
+                result = self.work(item)
+            except Exception as e:
+                print(f"❌ Error in {self.name} stage: {e}")
+                continue
+            self.fps.tick()
+            if self.outbox is not None and result is not None:
+                self.outbox.put(result)
+
+
+def format_rates(meters):
+    """One-line frame rate summary for a list of (label, FpsMeter) pairs"""
+    return " | ".join(f"{label} {meter.read():.1f} fps" for label, meter in meters)
@@ -0,0 +1,110 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+# Local only by default: the stream shows the shopper camera unauthenticated.
+# Watch it over an SSH tunnel, or pass --preview-host 0.0.0.0 for the LAN
+PREVIEW_HOST = "127.0.0.1"
+PREVIEW_PORT = 8080
+# Frames per second sent to viewers; the detector may run faster
+PREVIEW_FPS = 5.0
+JPEG_QUALITY = 70
+BOUNDARY = "frame"
+
+
+class MjpegPreview:
+    """Serve annotated frames as an MJPEG stream for remote debugging
+
+    Open http://<cart>:8080/ in a browser. Nothing is drawn or encoded while
+    no one is watching: the detector asks `wanted()` before annotating a
+    frame, and `publish()` encodes at most `max_fps` frames per second, once
+    for all connected viewers.
+    """
+
+    def __init__(self, port=PREVIEW_PORT, host=PREVIEW_HOST, max_fps=PREVIEW_FPS,
+                 quality=JPEG_QUALITY):
+        self.address = (host, port)
+        self.interval = 1.0 / max_fps
+        self.quality = quality
+        self._cond = threading.Condition()
+        self._jpeg = None
+        self._seq = 0
+        self._clients = 0
+        self._next_due = 0.0
+        self._stopped = False
+        self._server = None
+
+    def start(self):
+        preview = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ("/", "/stream.mjpg"):
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+                self.end_headers()
+                preview._stream(self.wfile)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(self.address, Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="preview", daemon=True).start()
+        print(f"📺 Preview at http://{self.address[0]}:{self._server.server_port}/")
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def wanted(self):
+        """True if a viewer is connected and the next preview frame is due"""
+        return self._clients > 0 and time.monotonic() >= self._next_due
+
+    def publish(self, frame):
+        """Encode and send a frame if one is wanted; returns whether it was sent"""
+        if not self.wanted():
+            return False
+        self._next_due = time.monotonic() + self.interval
+        ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return False
+        with self._cond:
+            self._jpeg = jpeg.tobytes()
+            self._seq += 1
+            self._cond.notify_all()
+        return True
+
+    def _stream(self, wfile):
+        with self._cond:
+            self._clients += 1
+            seen = self._seq
+        try:
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._seq != seen or self._stopped, 1.0)
+                    if self._stopped:
+                        return
+                    if self._seq == seen:
+                        continue
+                    seen = self._seq
+                    jpeg = self._jpeg
+                wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                            f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                wfile.write(jpeg)
+                wfile.write(b"\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with self._cond:
+                self._clients -= 1
@@ -0,0 +1,115 @@
+from collections import namedtuple
+
+import numpy as np
+
+# All product base names the model was trained on
+BASE_NAMES = [
+    "amul_darkchocolate", "balaji_aloo_sev", "balaji_ratlami_sev",
+    "balaji_wafers_chaatchaska", "balaji_wafers_masalamasti",
+    "balaji_wafers_simplysalted", "balaji_wafers_tomatotwist",
+    "britannia_marie_gold", "cadbury_celebrations", "closeup",
+    "colgate_strong_teeth", "dark_fantasy_choco_fills", "dove_shampoo",
+    "dove_soap", "everest_chaat_masala", "everest_garam_masala",
+    "head_and_shoulders", "krack_jack", "lakme_peach_moisturiser",
+    "lifebuoy", "liril_bodywash", "lux", "maggi", "nescafe_coffee",
+    "patanjali_aloevera_gel", "pears", "real_grape_juice", "rin_soap",
+    "shreeji_dabeli_masala", "shreeji_undhiyu_masala", "surf_excel",
+    "tata_salt", "tresemme_black", "vaseline_aloe_fresh",
+    "veg_hakka_noodles", "vicco_vajradanti", "vim_bar"
+]
+
+# Pre-sort the base names by length (longest first) so the longest prefix wins
+BASE_NAMES_SORTED = sorted(BASE_NAMES, key=len, reverse=True)
+
+# Everything the detection loop needs to know about a model class
+ProductRecord = namedtuple("ProductRecord", ["name", "barcode", "price", "color"])
+
+
+def cart_delta(records):
+    """Collapse one frame's ProductRecords into (record, quantity) pairs
+
+    Items confirmed together go to the cart as a single change with a count
+    per product, in the order they were first seen.
+    """
+    counts = {}
+    for record in records:
+        counts[record] = counts.get(record, 0) + 1
+    return list(counts.items())
+
+
+def match_base_name(class_name):
+    """Longest base name that prefixes a model class name, or None"""
+    for base_name in BASE_NAMES_SORTED:
+        if class_name.startswith(base_name):
+            return base_name
+    return None
+
+
+def category_color(product_name):
+    """Color coding for product categories"""
+    product_name = product_name.lower()
+    if 'chocolate' in product_name or 'biscuit' in product_name:
+        return (0, 255, 0)  # Green for snacks
+    elif 'shampoo' in product_name or 'soap' in product_name:
+        return (255, 0, 0)  # Blue for personal care
+    return (255, 255, 255)  # Default: White
+
+
+def build_class_table(model_names, lookup=None):
+    """Resolve every model class id to a ProductRecord, indexed by class id
+
+    `lookup(name)` returns catalog details for a product name; without it only
+    names and colors are filled in. Raises ValueError listing every class that
+    has no base name or no catalog entry, so a bad model/catalog pair fails at
+    startup instead of silently never adding items.
+    """
+    table = [None] * (max(model_names) + 1 if model_names else 0)
+    missing = []
+    for class_id, class_name in model_names.items():
+        name = match_base_name(class_name)
+        product = lookup(name) if lookup and name else {}
+        if name is None or product is None:
+            missing.append(f"{class_id}:{class_name}")
+            continue
+        table[class_id] = ProductRecord(
+            name=name,
+            barcode=product.get("barcode", ""),
+            price=product.get("price", 0),
+            color=category_color(name),
+        )
+    if missing:
+        raise ValueError(f"Model classes without a catalog entry: {', '.join(missing)}")
+    return table
+
+
+class ClassTable:
+    """class_id -> ProductRecord table that follows catalog updates
+
+    `records` is a plain list so the detection loop does a single index per box.
+    `names` and `colors` are arrays indexed by class id, so a whole frame of
+    class ids maps to labels and colors with one fancy index. They only depend
+    on the model's classes, so catalog updates leave them alone.
+    """
+
+    def __init__(self, model_names, catalog=None):
+        self.model_names = model_names
+        self.catalog = catalog
+        self.records = build_class_table(model_names, catalog.get if catalog else None)
+        self.names = np.array([r.name if r else "" for r in self.records], dtype=object)
+        self.colors = np.array([r.color if r else (255, 255, 255) for r in self.records],
+                               dtype=np.int32).reshape(-1, 3)
+        if catalog is not None:
+            catalog.subscribe(self._rebuild)
+
+    def __getitem__(self, class_id):
+        return self.records[class_id]
+
+    def __len__(self):
+        return len(self.records)
+
+    def _rebuild(self):
+        try:
+            self.records = build_class_table(self.model_names, self.catalog.get)
+        except ValueError as e:
+            # Keep serving the last good table rather than stopping detection
+            print(f"⚠️ Catalog update ignored: {e}")
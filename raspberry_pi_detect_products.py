@@ -1,239 +1,187 @@
+import argparse
 import cv2
-import numpy as np
-import firebase_admin
-from firebase_admin import credentials, firestore
-from datetime import datetime
+import sqlite3
+import threading
 import time
-from ultralytics import YOLO
-import RPi.GPIO as GPIO
-
-# Initialize GPIO
-GPIO.setmode(GPIO.BCM)
-GPIO.setwarnings(False)
+from cart_detector import CartDetector
+from preview import MjpegPreview, PREVIEW_HOST, PREVIEW_PORT
+from leds import LedController, load_gpio
+from pipeline import LatestQueue, WorkQueue, FpsMeter, CaptureThread, Stage, format_rates, STATS_INTERVAL
+from metrics import start_metrics, METRICS_PORT
 
 # LED pins
 GREEN_LED = 17  # New item added
 BLUE_LED = 27   # Quantity updated
 RED_LED = 22    # No detection
 
-# Setup GPIO pins
-GPIO.setup(GREEN_LED, GPIO.OUT)
-GPIO.setup(BLUE_LED, GPIO.OUT)
-GPIO.setup(RED_LED, GPIO.OUT)
-
-# Initialize all LEDs to off
-GPIO.output(GREEN_LED, GPIO.LOW)
-GPIO.output(BLUE_LED, GPIO.LOW)
-GPIO.output(RED_LED, GPIO.LOW)
-
-# Initialize Firebase
-cred = credentials.Certificate("serviceAccountKey.json")
-firebase_admin.initialize_app(cred)
-db = firestore.client()
-
-# Initialize YOLO model
-model = YOLO('honey.pt')
+# Initialize GPIO (falls back to a mock off the Pi)
+GPIO = load_gpio()
+GPIO.setmode(GPIO.BCM)
+GPIO.setwarnings(False)
 
-# Create a list of all product base names from your database
-BASE_NAMES = [
-    "amul_darkchocolate", "balaji_aloo_sev", "balaji_ratlami_sev", 
-    "balaji_wafers_chaatchaska", "balaji_wafers_masalamasti",
-    "balaji_wafers_simplysalted", "balaji_wafers_tomatotwist",
-    "britannia_marie_gold", "cadbury_celebrations", "closeup",
-    "colgate_strong_teeth", "dark_fantasy_choco_fills", "dove_shampoo",
-    "dove_soap", "everest_chaat_masala", "everest_garam_masala",
-    "head_and_shoulders", "krack_jack", "lakme_peach_moisturiser",
-    "lifebuoy", "liril_bodywash", "lux", "maggi", "nescafe_coffee",
-    "patanjali_aloevera_gel", "pears", "real_grape_juice", "rin_soap",
-    "shreeji_dabeli_masala", "shreeji_undhiyu_masala", "surf_excel",
-    "tata_salt", "tresemme_black", "vaseline_aloe_fresh",
-    "veg_hakka_noodles", "vicco_vajradanti", "vim_bar"
-]
+# LEDs are driven from their own thread so blinks never stall detection
+leds = LedController(GPIO, [GREEN_LED, BLUE_LED, RED_LED])
+leds.start()
 
-# Pre-sort the base names by length (longest first) for more efficient matching
-BASE_NAMES_SORTED = sorted(BASE_NAMES, key=len, reverse=True)
+# Warn when this many per-frame cart deltas are waiting for the cart stage
+CART_BACKLOG_WARN = 8
+# Wait this long before retrying a cart delta the journal could not take (seconds)
+CART_RETRY = 0.5
 
-CLASS_NAME_MAP = {}
-for class_id, name in model.names.items():
-    # Find the longest matching base name
-    matched_name = None
-    for base_name in BASE_NAMES_SORTED:
-        if name.startswith(base_name):
-            matched_name = base_name
-            break
+class LedCartDetector(CartDetector):
+    """CartDetector that shows what happens on the status LEDs"""
     
-    # If no match found, fall back to first two parts
-    if matched_name is None:
-        parts = name.split('_')
-        matched_name = '_'.join(parts[:2])
+    def __init__(self, leds):
+        super().__init__()
+        self.leds = leds
     
-    CLASS_NAME_MAP[class_id] = matched_name
-
-# Track recently detected objects
-last_detection_time = 0  # Track the last time any product was added
-cooldown_period = 2.0    # 2 seconds cooldown after adding a product
-
-def blink_led(pin, duration=0.5):
-    """Blink an LED for a specified duration"""
-    GPIO.output(pin, GPIO.HIGH)
-    time.sleep(duration)
-    GPIO.output(pin, GPIO.LOW)
-
-def lookup_product(name):
-    """Search Firebase for product details by name"""
-    docs = db.collection("products").where("name", "==", name).get()
-    return docs[0].to_dict() if docs else None
+    def on_detections(self, detections):
+        # Red LED on while nothing is detected (only written when it changes)
+        self.leds.set(RED_LED, len(detections) == 0)
+    
+    def on_added(self, new):
+        # Green LED if anything is new to the cart, blue for quantity updates only
+        self.leds.blink(GREEN_LED if new else BLUE_LED)
 
-def get_category_color(class_id):
-    """Color coding for product categories"""
-    product_name = CLASS_NAME_MAP.get(class_id, "").lower()
-    if 'chocolate' in product_name or 'biscuit' in product_name:
-        return (0, 255, 0)  # Green for snacks
-    elif 'shampoo' in product_name or 'soap' in product_name:
-        return (255, 0, 0)  # Blue for personal care
-    return (255, 255, 255)  # Default: White
+# Model, catalog and cart sync are loaded by detector.start_system()
+detector = LedCartDetector(leds)
 
-def add_to_cart(product):
-    """Add product with full details to cart or increment quantity if already exists"""
-    cart_ref = db.collection("carts").document("current")
-    
-    try:
-        cart = cart_ref.get()
-        if cart.exists:
-            items = cart.to_dict().get("items", [])
-            
-            found = False
-            for item in items:
-                if item.get("barcode") == product.get("barcode"):
-                    item["quantity"] += 1
-                    item["timestamp"] = datetime.now()
-                    found = True
-                    break
-            
-            if found:
-                cart_ref.update({"items": items})
-                print(f"➕ Updated quantity for: {product['name']}")
-                blink_led(BLUE_LED)  # Blue LED for quantity update
-            else:
-                new_item = {
-                    "barcode": product.get("barcode", ""),
-                    "name": product["name"],
-                    "price": product.get("price", 0),
-                    "quantity": 1,
-                    "timestamp": datetime.now()
-                }
-                cart_ref.update({"items": firestore.ArrayUnion([new_item])})
-                print(f"✅ Added to cart: {product['name']}")
-                blink_led(GREEN_LED)  # Green LED for new item
-        else:
-            cart_ref.set({
-                "items": [{
-                    "barcode": product.get("barcode", ""),
-                    "name": product["name"],
-                    "price": product.get("price", 0),
-                    "quantity": 1,
-                    "timestamp": datetime.now()
-                }]
-            })
-            print(f"✅ Created cart with: {product['name']}")
-            blink_led(GREEN_LED)  # Green LED for new item
-    except Exception as e:
-        print(f"❌ Error updating cart: {e}")
+class DetectionPipeline:
+    """Capture -> inference -> cart, each on its own thread so a slow
+    Firestore call or LED blink never stalls the camera or the model
 
-def process_frame(frame):
-    """Detect products and manage cart additions with cooldown"""
-    global last_detection_time
-    
-    current_time = time.time()
+    The pipeline can be stopped and started again on the same camera; the
+    model and the cart sync stay loaded in between. Annotated frames are only
+    produced while `show` is set or a preview viewer is connected.
+    """
     
-    # Check if we're in cooldown period
-    if current_time - last_detection_time < cooldown_period:
-        return frame
+    def __init__(self, detector, cap, show=False, preview=None):
+        self.detector = detector
+        self.cap = cap
+        self.show = show
+        self.preview = preview
+        self.annotated = LatestQueue()
+        # Every delta is a purchase, so this queue never drops anything
+        self.pending = WorkQueue()
+        self.workers = []
+        self._stop_event = None
     
-    results = model(frame, verbose=False)
+    @property
+    def running(self):
+        return bool(self.workers)
     
-    # Turn on red LED if no detections
-    if len(results[0].boxes) == 0:
-        GPIO.output(RED_LED, GPIO.HIGH)
-    else:
-        GPIO.output(RED_LED, GPIO.LOW)
+    def _infer(self, frame):
+        # Only annotate frames someone is going to look at
+        draw = self.show or (self.preview is not None and self.preview.wanted())
+        frame, delta = self.detector.process_frame(frame, draw)
+        if delta:
+            self.pending.put(delta)
+        return frame if draw else None
     
-    # Process detections with highest confidence first
-    detections = []
-    for result in results:
-        for box in result.boxes:
-            x1, y1, x2, y2 = map(int, box.xyxy[0].cpu().numpy())
-            class_id = int(box.cls[0])
-            conf = float(box.conf[0])
-            detections.append((conf, class_id, (x1, y1, x2, y2)))
+    def _add(self, delta):
+        try:
+            self.detector.add_to_cart(delta)
+        except sqlite3.OperationalError as e:
+            # Journal locked by the cart GUI; keep the delta and try again
+            print(f"⚠️ Cart journal busy, retrying: {e}")
+            self.pending.requeue(delta)
+            self._stop_event.wait(CART_RETRY)
     
-    # Sort detections by confidence (highest first)
-    detections.sort(reverse=True, key=lambda x: x[0])
+    def start(self):
+        if self.workers:
+            return
+        self._stop_event = threading.Event()
+        frames = LatestQueue()
+        self.workers = [
+            CaptureThread(self.cap, frames, self._stop_event),
+            Stage("inference", self._infer, frames, self.annotated, self._stop_event),
+            # Detections still queued from a previous run are added first
+            Stage("cart", self._add, self.pending, None, self._stop_event),
+        ]
+        for worker in self.workers:
+            worker.start()
     
-    for conf, class_id, (x1, y1, x2, y2) in detections:
-        product_name = CLASS_NAME_MAP.get(class_id, f"ID {class_id}")
-        color = get_category_color(class_id)
-        
-        # Draw bounding box for visualization
-        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-        cv2.putText(frame, f"{product_name} {conf:.2f}", (x1, y1 - 10),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-        
-        # Only process for cart if confidence is high enough
-        if conf > 0.5:
-            product = lookup_product(product_name)
-            if product:
-                # Immediately add to cart
-                add_to_cart(product)
-                # Set cooldown period
-                last_detection_time = time.time()
-                # Break after first high-confidence detection to avoid multiple additions
-                break
+    def stop(self):
+        if not self.workers:
+            return
+        self._stop_event.set()
+        for worker in self.workers:
+            worker.join(timeout=2.0)
+        cart_stage = self.workers[-1]
+        self.workers = []
+        # Record what is still queued now rather than on the next start; a
+        # delta the journal still refuses stays queued for the next start
+        if not cart_stage.is_alive():
+            for _ in range(len(self.pending)):
+                self._add(self.pending.get())
+        self.detector.leds.set(RED_LED, False)
     
-    return frame
+    def meters(self):
+        return [(w.name, w.fps) for w in self.workers]
 
-def main():
-    # Camera initialization
-    found = False
-    for index in range(3):  # Try index 0, 1, 2
-        for backend in [cv2.CAP_DSHOW, cv2.CAP_MSMF, cv2.CAP_ANY]:
-            cap = cv2.VideoCapture(index,  backend)
-            if cap.isOpened():
-                print(f"Camera found at index {index} using backend: {backend}")
-                found = True
-                break
-            cap.release()
-        if found:
-            break
-
-    if not found:
-        print("Error: Could not open any camera")
-        sys.exit(1)
+def main(args):
+    cap = detector.start_system()
+    
+    print("System ready! Detected products will be added immediately. "
+          + ("Press Ctrl+C to quit." if args.headless else "Press 'q' to quit."))
     
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-    cap.set(cv2.CAP_PROP_FPS, 15)
+    show = not args.headless
+    preview = MjpegPreview(args.preview, args.preview_host).start() if args.preview else None
+    metrics_log, metrics_server = start_metrics(args.metrics)
+    pipeline = DetectionPipeline(detector, cap, show, preview)
+    pipeline.start()
     
-    print("System ready! Detected products will be added immediately. Press 'q' to quit.")
+    display_fps = FpsMeter()
+    meters = pipeline.meters()
+    if show:
+        meters.append(("display", display_fps))
+    last_report = time.monotonic()
     
     try:
         while True:
-            ret, frame = cap.read()
-            if not ret:
-                print("Failed to grab frame, retrying...")
-                time.sleep(0.1)
-                continue
+            frame = pipeline.annotated.get(timeout=0.05)
+            if frame is not None:
+                if preview:
+                    preview.publish(frame)
+                if show:
+                    cv2.imshow('Product Scanner', frame)
+                    display_fps.tick()
             
-            frame = process_frame(frame)
-            cv2.imshow('Product Scanner', frame)
-            
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+            if show and cv2.waitKey(1) & 0xFF == ord('q'):
                 break
+            
+            if time.monotonic() - last_report >= STATS_INTERVAL:
+                print(f"📊 {format_rates(meters)} | {detector.motion_gate.stats()}")
+                if len(pipeline.pending) >= CART_BACKLOG_WARN:
+                    print(f"⚠️ {len(pipeline.pending)} cart updates waiting, cart stage is falling behind")
+                last_report = time.monotonic()
+    except KeyboardInterrupt:
+        pass
     finally:
         # Clean up
+        pipeline.stop()
+        detector.cart_writer.stop()
         cap.release()
-        cv2.destroyAllWindows()
+        if preview:
+            preview.stop()
+        if metrics_server:
+            metrics_server.stop()
+        if show:
+            cv2.destroyAllWindows()
+        leds.stop()
         GPIO.cleanup()
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Detect products and add them to the cart")
+    parser.add_argument("--headless", action="store_true",
+                        help="no window and no drawing (quit with Ctrl+C)")
+    parser.add_argument("--preview", type=int, nargs="?", const=PREVIEW_PORT, metavar="PORT",
+                        help=f"serve an MJPEG preview over HTTP (default port {PREVIEW_PORT})")
+    parser.add_argument("--preview-host", default=PREVIEW_HOST,
+                        help=f"address the preview listens on (default {PREVIEW_HOST}, local only)")
+    parser.add_argument("--metrics", type=int, nargs="?", const=METRICS_PORT, metavar="PORT",
+                        help=f"serve latency metrics on /metrics (default port {METRICS_PORT})")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(parse_args())
\ No newline at end of file
@@ -0,0 +1,81 @@
+import cv2
+import numpy as np
+
+# Part of the frame products are dropped into, as fractions of the frame
+# (x1, y1, x2, y2). Only this region is passed to the model.
+DROP_ZONE = (0.0, 0.0, 1.0, 1.0)
+# Grow the region to cover every active track, so an item that is carried
+# out of the drop zone keeps being tracked until it leaves the frame
+ADAPTIVE_ROI = True
+# Extra space kept around each track, as a fraction of the box size
+TRACK_MARGIN = 0.25
+# Regions are never cropped smaller than this (pixels per side)
+MIN_ROI_SIZE = 96
+
+ROI_COLOR = (128, 128, 128)
+
+
+class RoiSelector:
+    """Pick the part of each frame that is worth running the model on
+
+    The fixed drop zone is always included. In adaptive mode the region is
+    grown to the union of the zone and every active track (plus a margin), so
+    the crop follows items the tracker is still following.
+    """
+
+    def __init__(self, zone=DROP_ZONE, adaptive=ADAPTIVE_ROI, margin=TRACK_MARGIN,
+                 min_size=MIN_ROI_SIZE):
+        self.zone = zone
+        self.adaptive = adaptive
+        self.margin = margin
+        self.min_size = min_size
+
+    def region(self, frame_shape, track_boxes=None):
+        """Pixel region (x1, y1, x2, y2) to crop from a frame of this shape"""
+        height, width = frame_shape[:2]
+        zx1, zy1, zx2, zy2 = self.zone
+        x1, y1, x2, y2 = zx1 * width, zy1 * height, zx2 * width, zy2 * height
+
+        if self.adaptive and track_boxes is not None and len(track_boxes):
+            boxes = np.asarray(track_boxes, dtype=np.float32).reshape(-1, 4)
+            pad_x = (boxes[:, 2] - boxes[:, 0]) * self.margin
+            pad_y = (boxes[:, 3] - boxes[:, 1]) * self.margin
+            x1 = min(x1, float((boxes[:, 0] - pad_x).min()))
+            y1 = min(y1, float((boxes[:, 1] - pad_y).min()))
+            x2 = max(x2, float((boxes[:, 2] + pad_x).max()))
+            y2 = max(y2, float((boxes[:, 3] + pad_y).max()))
+
+        # Keep a minimum size around the centre so tiny zones still see a product
+        size_x = min(width, self.min_size)
+        size_y = min(height, self.min_size)
+        if x2 - x1 < size_x:
+            centre = (x1 + x2) / 2
+            x1, x2 = centre - size_x / 2, centre + size_x / 2
+        if y2 - y1 < size_y:
+            centre = (y1 + y2) / 2
+            y1, y2 = centre - size_y / 2, centre + size_y / 2
+
+        x1 = int(np.clip(x1, 0, width - size_x))
+        y1 = int(np.clip(y1, 0, height - size_y))
+        x2 = int(np.clip(np.ceil(x2), x1 + size_x, width))
+        y2 = int(np.clip(np.ceil(y2), y1 + size_y, height))
+        return x1, y1, x2, y2
+
+
+def detect_in_region(model, frame, region):
+    """Run the model on one region of the frame
+
+    The crop is letterboxed to the model's input size by the backend; boxes
+    are shifted back to full-frame coordinates.
+    """
+    x1, y1, x2, y2 = region
+    height, width = frame.shape[:2]
+    if (x1, y1, x2, y2) == (0, 0, width, height):
+        return model.detect(frame)
+    return model.detect(frame[y1:y2, x1:x2]).shifted(x1, y1)
+
+
+def draw_region(frame, region):
+    """Outline the region the model looked at"""
+    x1, y1, x2, y2 = region
+    cv2.rectangle(frame, (x1, y1), (x2 - 1, y2 - 1), ROI_COLOR, 1)
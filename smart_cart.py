@@ -1,19 +1,79 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from firebase_service import db
+from cart_store import CartStore, CartChangedError, InvoiceExistsError, cart_items, synced_seq, other_journals, watch_carts
+from cart_journal import CartJournal
+from cart_writer import CartWriter
 from datetime import datetime
-import random
-import queue
+import argparse
 import threading
+import uuid
+from metrics import timed, start_metrics, METRICS_PORT
+from device import device_id, STORE_ID
+from ids import InvoiceNumbers
+
+# Minimum gap between cart redraws, so a burst of updates costs one redraw (ms)
+REDRAW_INTERVAL_MS = 16
+
+class LatestValueDispatcher:
+    """Hand the newest value from a worker thread to the Tk main loop
+
+    post() wakes the main loop with a virtual event instead of it polling a
+    queue, and values posted before the handler runs are merged so only the
+    latest one is handled. Pass `merge(pending, new)` to combine them instead.
+    """
+    def __init__(self, widget, event_name, handler, merge=None):
+        self.widget = widget
+        self.event_name = event_name
+        self.handler = handler
+        self.merge = merge
+        self._lock = threading.Lock()
+        self._value = None
+        self._pending = False
+        widget.bind(event_name, self._on_event)
+
+    def post(self, value):
+        """Thread-safe: deliver `value` to the handler on the main thread"""
+        with self._lock:
+            if self._pending and self.merge:
+                value = self.merge(self._value, value)
+            self._value = value
+            if self._pending:
+                return
+            self._pending = True
+        self.widget.event_generate(self.event_name, when="tail")
+
+    def _on_event(self, event):
+        with self._lock:
+            value, self._value = self._value, None
+            self._pending = False
+        self.handler(value)
 
 class SmartCartApp:
-    def __init__(self, root):
+    def __init__(self, root, cart_id=None):
         self.root = root
-        self.root.title("Smart Cart System")
+        self.cart_store = CartStore(db, cart_id)
+        self.root.title(f"Smart Cart System - {self.cart_store.cart_id}")
         
-        # Setup queue for thread-safe GUI updates
-        self.update_queue = queue.Queue()
-        self.root.after(100, self.process_updates)
+        # Changes go to the local journal first and are synced in the background
+        self.cart_journal = CartJournal(cart_id=self.cart_store.cart_id)
+        self.cart_writer = CartWriter(self.cart_store, self.cart_journal)
+        self.cart_writer.start()
+        # Invoice numbers come from a local counter of this device (which may be
+        # a kiosk checking out another cart), no network needed
+        self.invoice_numbers = InvoiceNumbers()
+        # Invoice number and checkout ID of a failed checkout, reused when the
+        # same cart contents are checked out again
+        self._pending_checkout = None
+        self._checkout_in_flight = False
+        # What other devices had synced into the snapshot on screen; checkout
+        # refuses to clear the cart if that changed
+        self._remote_others = {}
+        
+        # Cart snapshots from the Firestore listener thread wake the main loop
+        # directly; only the latest pending snapshot is applied
+        self.cart_updates = LatestValueDispatcher(root, "<<CartChanged>>", self.on_remote_cart)
+        self.checkout_done = LatestValueDispatcher(root, "<<CheckoutDone>>", self.on_checkout_done)
         
         # Cart Treeview with selection enabled
         self.tree = ttk.Treeview(root, columns=("Name", "Price", "Qty"), show="headings", selectmode='browse')
@@ -21,6 +81,8 @@ class SmartCartApp:
         self.tree.heading("Price", text="Price")
         self.tree.heading("Qty", text="Qty")
         self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self._rows = {}  # barcode (row iid) -> values currently shown
+        self._redraw_pending = False
         
         # Control Frame at bottom
         control_frame = tk.Frame(root)
@@ -53,74 +115,71 @@ class SmartCartApp:
         selected = self.tree.selection()
         self.selected_item = selected[0] if selected else None
 
-    def process_updates(self):
-        """Process updates from the queue in the main thread"""
-        while not self.update_queue.empty():
-            task = self.update_queue.get()
-            task()
-        self.root.after(100, self.process_updates)
-
     def load_cart(self):
-        """Load and monitor cart in real-time"""
-        cart_ref = db.collection("carts").document("current")
-        
-        def listener(doc_snapshot, changes, read_time):
-            cart = doc_snapshot[0].to_dict() if doc_snapshot else None
-            self.update_queue.put(lambda: self.update_cart_display(cart))
-        
-        # Initial load
-        cart = cart_ref.get().to_dict()
-        self.update_queue.put(lambda: self.update_cart_display(cart))
-        
-        # Start listener in separate thread
-        threading.Thread(
-            target=cart_ref.on_snapshot,
-            args=(listener,),
-            daemon=True
-        ).start()
+        """Show the local cart and keep it in sync with Firestore"""
+        # Initial load straight from the local journal, no network round trip
+        self.refresh_cart()
+        self.cart_store.watch(self.cart_updates.post)
+
+    def close(self):
+        """Stop listening and flush pending changes (when a kiosk closes the cart)"""
+        self.cart_store.unwatch()
+        self.cart_writer.stop()
+        self.root.destroy()
+
+    @timed("ui.remote_cart")
+    def on_remote_cart(self, cart):
+        """Merge the latest Firestore snapshot into the local store and redraw"""
+        self.cart_journal.apply_remote(
+            cart_items(cart), synced_seq(cart, self.cart_journal.journal_id))
+        self._remote_others = other_journals(cart, self.cart_journal.journal_id)
+        self.refresh_cart()
+
+    def refresh_cart(self):
+        """Schedule a redraw from the local store, merging bursts into one"""
+        if self._redraw_pending:
+            return
+        self._redraw_pending = True
+        self.root.after(REDRAW_INTERVAL_MS, self._redraw_cart)
 
-    def update_cart_display(self, cart):
-        """Update the cart display"""
-        # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        # Add new items if cart exists
-        if cart and "items" in cart:
-            for item in cart["items"]:
-                self.tree.insert("", tk.END, values=(
-                    item["name"],
-                    f"₹ {item['price']:.2f}",
-                    item["quantity"]
-                ), tags=(item["barcode"],))
+    @timed("ui.redraw")
+    def _redraw_cart(self):
+        self._redraw_pending = False
+        self.update_cart_display(self.cart_journal.items())
+
+    def update_cart_display(self, items):
+        """Update only the rows that changed, keyed by barcode"""
+        rows = {}
+        for item in items:
+            rows[item["barcode"]] = (
+                item["name"],
+                f"₹ {item['price']:.2f}",
+                item["quantity"]
+            )
+        
+        for barcode in self._rows.keys() - rows.keys():
+            self.tree.delete(barcode)
+        
+        # Items come sorted, so existing rows already keep their relative order
+        # and new ones only need inserting at their index
+        for index, (barcode, values) in enumerate(rows.items()):
+            if barcode not in self._rows:
+                self.tree.insert("", index, iid=barcode, values=values)
+            elif self._rows[barcode] != values:
+                self.tree.item(barcode, values=values)
+        
+        self._rows = rows
 
     def get_selected_barcode(self):
-        """Get barcode of selected item"""
-        if not self.selected_item:
+        """Get barcode of selected item (rows use the barcode as their iid)"""
+        if not self.selected_item or not self.tree.exists(self.selected_item):
             return None
-        return self.tree.item(self.selected_item, "tags")[0]
+        return self.selected_item
 
     def update_quantity(self, barcode, change):
-        """Update item quantity in Firebase"""
-        def update_task():
-            cart_ref = db.collection("carts").document("current")
-            cart = cart_ref.get().to_dict()
-            
-            if not cart or "items" not in cart:
-                return
-                
-            for item in cart["items"]:
-                if item["barcode"] == barcode:
-                    new_qty = item["quantity"] + change
-                    if new_qty > 0:
-                        item["quantity"] = new_qty
-                    else:
-                        cart["items"].remove(item)
-                    break
-                    
-            cart_ref.update({"items": cart["items"]})
-        
-        threading.Thread(target=update_task, daemon=True).start()
+        """Update item quantity locally; the change is synced in the background"""
+        self.cart_writer.change_quantity(barcode, change)
+        self.refresh_cart()
 
     def increase_qty(self):
         """Increase quantity of selected item"""
@@ -141,14 +200,12 @@ class SmartCartApp:
     def clear_cart(self):
         """Clear all items from cart"""
         if messagebox.askyesno("Confirm", "Clear all items from cart?"):
-            db.collection("carts").document("current").update({"items": []})
+            self.cart_writer.clear()
+            self.refresh_cart()
 
     def show_checkout(self):
         """Show checkout form window"""
-        cart_ref = db.collection("carts").document("current")
-        cart = cart_ref.get().to_dict()
-        
-        if not cart or not cart.get("items"):
+        if not self.cart_journal.items():
             messagebox.showerror("Error", "Cart is empty")
             return
             
@@ -165,51 +222,112 @@ class SmartCartApp:
         phone_entry.grid(row=1, column=1, padx=5, pady=5)
         
         # Submit button
-        tk.Button(checkout_win, text="Complete Purchase",
+        submit_btn = tk.Button(checkout_win, text="Complete Purchase",
                  command=lambda: self.process_checkout(
                      name_entry.get(),
                      phone_entry.get(),
-                     checkout_win
-                 )).grid(row=2, columnspan=2, pady=10)
+                     checkout_win,
+                     submit_btn,
+                     status_label
+                 ))
+        submit_btn.grid(row=2, columnspan=2, pady=10)
+        
+        # Checkout progress
+        status_label = tk.Label(checkout_win, text="")
+        status_label.grid(row=3, columnspan=2, pady=5)
 
-    def process_checkout(self, name, phone, window):
-        """Generate invoice and clear cart"""
+    def process_checkout(self, name, phone, window, submit_btn, status_label):
+        """Generate invoice and clear cart in the background"""
         if not name or not phone:
             messagebox.showerror("Error", "Please fill all fields")
             return
             
-        cart_ref = db.collection("carts").document("current")
-        cart = cart_ref.get().to_dict()
+        # Use the local cart, no need to fetch it again
+        items, upto_seq = self.cart_journal.snapshot()
+        others = self._remote_others
         
-        if not cart or not cart.get("items"):
+        if not items:
             messagebox.showerror("Error", "Cart is empty")
             return
+        
+        # Only one checkout at a time, even with several checkout windows open
+        if self._checkout_in_flight:
+            return
+        
+        # A retry of the same contents keeps its invoice number, so a checkout
+        # that went through despite an error is not billed twice
+        pending = self._pending_checkout
+        if pending is None or (pending["upto_seq"], pending["others"]) != (upto_seq, others):
+            pending = self._pending_checkout = {
+                "upto_seq": upto_seq,
+                "others": others,
+                "invoice_number": self.generate_invoice_number(),
+                "checkout_id": uuid.uuid4().hex,
+            }
             
         # Generate invoice
         invoice_data = {
-            "invoice_number": self.generate_invoice_number(),
+            "invoice_number": pending["invoice_number"],
+            "checkout_id": pending["checkout_id"],
             "customer_name": name,
             "customer_phone": phone,
-            "items": cart["items"],
-            "total": sum(item["price"] * item["quantity"] for item in cart["items"]),
+            "items": items,
+            "total": sum(item["price"] * item["quantity"] for item in items),
             "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "status": "paid"
         }
         
-        # Save to Firebase
-        db.collection("invoices").add(invoice_data)
-        cart_ref.update({"items": []})
+        self._checkout_in_flight = True
+        self.checkout_btn.config(state=tk.DISABLED)
+        submit_btn.config(state=tk.DISABLED)
+        status_label.config(text="⏳ Saving invoice...")
+        
+        def checkout_task():
+            # Invoice write and cart clear happen in one Firestore transaction
+            try:
+                self.cart_writer.checkout(upto_seq, invoice_data, others)
+                error = None
+            except Exception as e:
+                error = e
+            self.checkout_done.post((invoice_data, window, submit_btn, status_label, error))
+        
+        threading.Thread(target=checkout_task, daemon=True).start()
+
+    def on_checkout_done(self, result):
+        """Finish checkout on the main thread once the background job is done"""
+        invoice_data, window, submit_btn, status_label, error = result
+        self._checkout_in_flight = False
+        self.checkout_btn.config(state=tk.NORMAL)
+        if error is not None:
+            print(f"❌ Checkout failed: {error}")
+            if isinstance(error, CartChangedError):
+                message = "⚠️ Items were added meanwhile, check the cart and retry"
+            elif isinstance(error, InvoiceExistsError):
+                # The invoice counter was reset; the retry takes the next number
+                self._pending_checkout = None
+                message = "⚠️ Invoice number already used, press Complete Purchase again"
+            else:
+                message = "❌ Checkout failed, check the connection and retry"
+            self.refresh_cart()
+            if window.winfo_exists():
+                status_label.config(text=message)
+                submit_btn.config(state=tk.NORMAL)
+            return
+        
+        self._pending_checkout = None
+        self.refresh_cart()
         
         # Show success
         messagebox.showinfo("Success", f"Invoice #{invoice_data['invoice_number']} generated!")
-        window.destroy()
+        if window.winfo_exists():
+            window.destroy()
         
         # Print invoice (optional)
         self.print_invoice(invoice_data)
 
     def generate_invoice_number(self):
-        """Generate unique invoice number"""
-        return f"INV-{datetime.now().strftime('%Y%m%d')}-{random.randint(1000,9999)}"
+        """Next invoice number of this cart, unique across all carts"""
+        return self.invoice_numbers.next()
 
     def print_invoice(self, invoice):
         """Display invoice in new window"""
@@ -252,8 +370,89 @@ class SmartCartApp:
         # Close button
         tk.Button(invoice_win, text="Close", command=invoice_win.destroy).pack(pady=10)
 
+def merge_cart_changes(pending, new):
+    """Combine two {cart_id: cart} batches, newest cart state wins"""
+    return {**pending, **new}
+
+class KioskApp:
+    """Overview of every cart in a store from a single Firestore listener
+
+    One collection-group listener delivers only the carts that changed, and
+    batches arriving before the main loop catches up are merged, so the cost
+    stays flat with 50+ carts. Double-click a cart to open it.
+    """
+    def __init__(self, root, store=STORE_ID):
+        self.root = root
+        self.root.title(f"Smart Cart Kiosk - {store}")
+        self.carts = {}  # cart_id -> cart dict
+        self.open_carts = {}  # cart_id -> SmartCartApp
+        
+        self.tree = ttk.Treeview(root, columns=("Cart", "Items", "Total"), show="headings", selectmode='browse')
+        self.tree.heading("Cart", text="Cart")
+        self.tree.heading("Items", text="Items")
+        self.tree.heading("Total", text="Total")
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.tree.bind("<Double-1>", self.open_selected)
+        
+        self.summary = tk.Label(root, text="Waiting for carts...")
+        self.summary.pack(pady=5)
+        
+        self.cart_updates = LatestValueDispatcher(root, "<<CartsChanged>>", self.on_carts,
+                                                  merge=merge_cart_changes)
+        self.watch = watch_carts(db, self.cart_updates.post, store)
+
+    @timed("ui.kiosk_update")
+    def on_carts(self, changes):
+        """Update only the rows of the carts that changed"""
+        for cart_id, cart in changes.items():
+            if cart is None:
+                self.carts.pop(cart_id, None)
+                if self.tree.exists(cart_id):
+                    self.tree.delete(cart_id)
+                continue
+            self.carts[cart_id] = cart
+            items = cart_items(cart)
+            values = (cart_id,
+                      sum(item["quantity"] for item in items),
+                      f"₹ {sum(item['price'] * item['quantity'] for item in items):.2f}")
+            if self.tree.exists(cart_id):
+                self.tree.item(cart_id, values=values)
+            else:
+                self.tree.insert("", tk.END, iid=cart_id, values=values)
+        active = sum(1 for cart in self.carts.values() if cart_items(cart))
+        self.summary.config(text=f"{len(self.carts)} carts, {active} with items")
+
+    def open_selected(self, event):
+        selected = self.tree.selection()
+        if not selected:
+            return
+        cart_id = selected[0]
+        app = self.open_carts.get(cart_id)
+        if app is not None and app.root.winfo_exists():
+            app.root.lift()
+            return
+        window = tk.Toplevel(self.root)
+        window.geometry("800x600")
+        app = SmartCartApp(window, cart_id)
+        window.protocol("WM_DELETE_WINDOW", app.close)
+        self.open_carts[cart_id] = app
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Live cart and checkout")
+    parser.add_argument("--cart-id", default=None,
+                        help="cart to show (default: this device's cart)")
+    parser.add_argument("--kiosk", action="store_true",
+                        help="show every cart of the store and open them on demand")
+    parser.add_argument("--store", default=STORE_ID, help="store to watch in kiosk mode")
+    parser.add_argument("--metrics", type=int, nargs="?", const=METRICS_PORT, metavar="PORT",
+                        help=f"serve latency metrics on /metrics (default port {METRICS_PORT})")
+    args = parser.parse_args()
+    start_metrics(args.metrics)
+    
     root = tk.Tk()
     root.geometry("800x600")
-    app = SmartCartApp(root)
+    if args.kiosk:
+        app = KioskApp(root, args.store)
+    else:
+        app = SmartCartApp(root, args.cart_id or device_id())
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,117 @@
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+SERVICE_ACCOUNT_KEY = "serviceAccountKey.json"
+# Last camera index/backend that opened, tried first on the next start
+CAMERA_CACHE = ".camera_cache.json"
+CAMERA_INDEXES = range(3)
+
+
+def init_firestore(key_path=SERVICE_ACCOUNT_KEY):
+    """Initialize the Firebase app and return a Firestore client"""
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    firebase_admin.initialize_app(credentials.Certificate(key_path))
+    return firestore.client()
+
+
+def camera_backends():
+    """Capture backends worth trying on this platform, best first"""
+    if sys.platform.startswith("win"):
+        return [cv2.CAP_DSHOW, cv2.CAP_MSMF, cv2.CAP_ANY]
+    if sys.platform == "darwin":
+        return [cv2.CAP_AVFOUNDATION, cv2.CAP_ANY]
+    return [cv2.CAP_V4L2, cv2.CAP_ANY]
+
+
+def _load_cached_camera(path):
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+        return int(cached["index"]), int(cached["backend"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _save_cached_camera(path, index, backend):
+    try:
+        with open(path, "w") as f:
+            json.dump({"index": index, "backend": backend}, f)
+    except OSError as e:
+        print(f"⚠️ Could not cache camera choice: {e}")
+
+
+def open_camera(width=640, height=480, fps=15, indexes=CAMERA_INDEXES, cache=CAMERA_CACHE):
+    """Open the first working camera, trying the last one that worked first
+
+    Raises RuntimeError if no index/backend combination opens.
+    """
+    candidates = [(index, backend) for index in indexes for backend in camera_backends()]
+    cached = _load_cached_camera(cache)
+    if cached in candidates:
+        candidates.remove(cached)
+        candidates.insert(0, cached)
+
+    for index, backend in candidates:
+        cap = cv2.VideoCapture(index, backend)
+        if cap.isOpened():
+            print(f"✅ Camera found at index {index} using backend {cap.getBackendName()}")
+            if (index, backend) != cached:
+                _save_cached_camera(cache, index, backend)
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            cap.set(cv2.CAP_PROP_FPS, fps)
+            return cap
+        cap.release()
+    raise RuntimeError("Could not open any camera")
+
+
+class Startup:
+    """Run the slow startup phases in parallel and time each one
+
+        startup = Startup()
+        startup.run("firestore", init_firestore)
+        startup.run("catalog", lambda db: ProductCatalog(db).start(), "firestore")
+        catalog = startup.result("catalog")
+
+    A phase listed as a dependency has its result passed as an argument.
+    `result()` re-raises whatever the phase raised.
+    """
+
+    def __init__(self):
+        self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="startup")
+        self._futures = {}
+        self._lock = threading.Lock()
+        self.timings = {}
+        self.started = time.monotonic()
+
+    def run(self, name, func, *depends_on):
+        deps = [self._futures[dep] for dep in depends_on]
+
+        def phase():
+            args = [dep.result() for dep in deps]
+            began = time.monotonic()
+            try:
+                return func(*args)
+            finally:
+                with self._lock:
+                    self.timings[name] = time.monotonic() - began
+
+        self._futures[name] = self._pool.submit(phase)
+        return self._futures[name]
+
+    def result(self, name):
+        return self._futures[name].result()
+
+    def report(self):
+        """Print how long each phase took and the overall time to ready"""
+        self._pool.shutdown(wait=False)
+        with self._lock:
+            phases = " | ".join(f"{name} {self.timings[name]:.2f}s"
+                                for name in self._futures if name in self.timings)
+        print(f"⏱️ Startup: {phases} | ready in {time.monotonic() - self.started:.2f}s")
@@ -1,92 +1,47 @@
+import argparse
 import cv2
 import time
-from ultralytics import YOLO
+from inference import load_backend
+from product_classes import ClassTable
+from overlay import draw_detections
+from preview import MjpegPreview, PREVIEW_HOST, PREVIEW_PORT
+from startup import Startup, open_camera
 
-# Initialize YOLO model
-model = YOLO('honey.pt')
+# Filled in by main(); the model loads while the camera is being opened
+model = None
+CLASS_TABLE = None
 
-# Create a list of all product base names from your original list
-BASE_NAMES = [
-    "amul_darkchocolate", "balaji_aloo_sev", "balaji_ratlami_sev", 
-    "balaji_wafers_chaatchaska", "balaji_wafers_masalamasti",
-    "balaji_wafers_simplysalted", "balaji_wafers_tomatotwist",
-    "britannia_marie_gold", "cadbury_celebrations", "closeup",
-    "colgate_strong_teeth", "dark_fantasy_choco_fills", "dove_shampoo",
-    "dove_soap", "everest_chaat_masala", "everest_garam_masala",
-    "head_and_shoulders", "krack_jack", "lakme_peach_moisturiser",
-    "lifebuoy", "liril_bodywash", "lux", "maggi", "nescafe_coffee",
-    "patanjali_aloevera_gel", "pears", "real_grape_juice", "rin_soap",
-    "shreeji_dabeli_masala", "shreeji_undhiyu_masala", "surf_excel",
-    "tata_salt", "tresemme_black", "vaseline_aloe_fresh",
-    "veg_hakka_noodles", "vicco_vajradanti", "vim_bar"
-]
-
-# Pre-sort base names by length (to match the longest substring first)
-BASE_NAMES_SORTED = sorted(BASE_NAMES, key=len, reverse=True)
-
-# Map model class IDs to base names
-CLASS_NAME_MAP = {}
-for class_id, name in model.names.items():
-    matched_name = None
-    for base_name in BASE_NAMES_SORTED:
-        if name.startswith(base_name):
-            matched_name = base_name
-            break
-    if matched_name is None:
-        parts = name.split('_')
-        matched_name = '_'.join(parts[:2])
-    CLASS_NAME_MAP[class_id] = matched_name
-
-def get_category_color(class_id):
-    """Color code for categories"""
-    name = CLASS_NAME_MAP.get(class_id, "").lower()
-    if 'chocolate' in name or 'biscuit' in name:
-        return (0, 255, 0)  # Green
-    elif 'shampoo' in name or 'soap' in name:
-        return (255, 0, 0)  # Blue
-    return (255, 255, 255)  # White
-
-def process_frame(frame):
+def process_frame(frame, draw=True):
     """Detect and label products"""
-    results = model(frame, verbose=False)
-
-    for result in results:
-        for box in result.boxes:
-            x1, y1, x2, y2 = map(int, box.xyxy[0].cpu().numpy())
-            class_id = int(box.cls[0])
-            conf = float(box.conf[0])
-
-            product_name = CLASS_NAME_MAP.get(class_id, f"ID {class_id}")
-            color = get_category_color(class_id)
-
-            # Draw bounding box and label
-            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-            cv2.putText(frame, f"{product_name} {conf:.2f}", (x1, y1 - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-    
-    return frame
-
-def main():
-    cap = None
-    for index in range(3):
-        for backend in [cv2.CAP_DSHOW, cv2.CAP_MSMF, cv2.CAP_ANY]:
-            cap = cv2.VideoCapture(index, backend)
-            if cap.isOpened():
-                print(f"✅ Camera found at index {index} using backend {backend}")
-                break
-            cap.release()
-        if cap and cap.isOpened():
-            break
-
-    if not cap or not cap.isOpened():
-        print("❌ Could not open any camera.")
+    detections = model.detect(frame)
+    if not draw:
+        print(" ".join(f"{CLASS_TABLE.names[c]}:{conf:.2f}" for conf, c, _ in detections) or "-")
+        return frame
+    return draw_detections(frame, detections, CLASS_TABLE)
+
+def main(args):
+    global model, CLASS_TABLE
+
+    startup = Startup()
+    # ONNX Runtime when an exported model is available, else PyTorch
+    startup.run("model", load_backend)
+    startup.run("camera", lambda: open_camera(fps=30))
+    # Resolve every model class to its product name and display color once
+    startup.run("classes", lambda model: ClassTable(model.names), "model")
+    try:
+        cap = startup.result("camera")
+    except RuntimeError as e:
+        print(f"❌ {e}.")
         return
+    model = startup.result("model")
+    CLASS_TABLE = startup.result("classes")
+    startup.report()
 
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-    cap.set(cv2.CAP_PROP_FPS, 30)
+    print("🎯 Model detection active. "
+          + ("Press Ctrl+C to quit." if args.headless else "Press 'q' to quit."))
 
-    print("🎯 Model detection active. Press 'q' to quit.")
+    show = not args.headless
+    preview = MjpegPreview(args.preview, args.preview_host).start() if args.preview else None
 
     try:
         while True:
@@ -95,14 +50,32 @@ def main():
                 print("⚠️ Frame grab failed.")
                 continue
 
-            frame = process_frame(frame)
-            cv2.imshow("Product Detection", frame)
-
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
+            draw = show or (preview is not None and preview.wanted())
+            frame = process_frame(frame, draw)
+            if preview and draw:
+                preview.publish(frame)
+            if show:
+                cv2.imshow("Product Detection", frame)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+    except KeyboardInterrupt:
+        pass
     finally:
         cap.release()
-        cv2.destroyAllWindows()
+        if preview:
+            preview.stop()
+        if show:
+            cv2.destroyAllWindows()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Show live detections from the model")
+    parser.add_argument("--headless", action="store_true",
+                        help="print detections instead of showing a window")
+    parser.add_argument("--preview", type=int, nargs="?", const=PREVIEW_PORT, metavar="PORT",
+                        help=f"serve an MJPEG preview over HTTP (default port {PREVIEW_PORT})")
+    parser.add_argument("--preview-host", default=PREVIEW_HOST,
+                        help=f"address the preview listens on (default {PREVIEW_HOST}, local only)")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    main()
+    main(parse_args())
@@ -0,0 +1,117 @@
+import numpy as np
+
+# Minimum IoU for a detection to continue an existing track
+TRACK_IOU = 0.3
+# Frames a track must be seen with the same class before it is committed
+CONFIRM_FRAMES = 3
+# Frames a track may go unseen before it is dropped
+MAX_MISSED = 5
+# Detections below this confidence are drawn but never tracked
+MIN_CONFIDENCE = 0.5
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU between two (N, 4) and (M, 4) xyxy box arrays"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+class ProductTracker:
+    """IoU tracker that commits each physical item once
+
+    Detections are matched to existing tracks by IoU (greedy, highest overlap
+    first). Every track keeps a vote per class; once one class has been seen in
+    `confirm_frames` frames the track is committed exactly once, however long
+    the item stays in view. A product that leaves and comes back starts a new
+    track and is counted again.
+    """
+
+    def __init__(self, iou_threshold=TRACK_IOU, confirm_frames=CONFIRM_FRAMES,
+                 max_missed=MAX_MISSED, min_confidence=MIN_CONFIDENCE):
+        self.iou_threshold = iou_threshold
+        self.confirm_frames = confirm_frames
+        self.max_missed = max_missed
+        self.min_confidence = min_confidence
+        self.next_id = 1
+        # Track state as parallel arrays so matching stays vectorised
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.missed = np.zeros(0, dtype=np.int64)
+        self.committed = np.zeros(0, dtype=bool)
+        self.votes = []  # per track: {class_id: frames seen}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def has_unconfirmed(self):
+        """Whether any track is still waiting for enough frames to commit"""
+        return bool((~self.committed).any())
+
+    def update(self, boxes, confs, class_ids):
+        """Feed one frame of detections
+
+        Returns (track_ids, confirmed): the track id for each detection (0 if
+        it was not tracked) and a list of (track_id, class_id) committed on this
+        frame.
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        confs = np.asarray(confs, dtype=np.float32)
+        class_ids = np.asarray(class_ids, dtype=np.int64)
+        track_ids = np.zeros(len(boxes), dtype=np.int64)
+        usable = np.flatnonzero(confs >= self.min_confidence)
+
+        matched_tracks = np.zeros(len(self.ids), dtype=bool)
+        matched_dets = np.zeros(len(boxes), dtype=bool)
+        if len(self.ids) and len(usable):
+            iou = iou_matrix(self.boxes, boxes[usable])
+            t_idx, d_idx = np.nonzero(iou >= self.iou_threshold)
+            order = np.argsort(-iou[t_idx, d_idx], kind="stable")
+            for t, d in zip(t_idx[order], usable[d_idx[order]]):
+                if matched_tracks[t] or matched_dets[d]:
+                    continue
+                matched_tracks[t] = True
+                matched_dets[d] = True
+                self.boxes[t] = boxes[d]
+                self.missed[t] = 0
+                votes = self.votes[t]
+                class_id = int(class_ids[d])
+                votes[class_id] = votes.get(class_id, 0) + 1
+                track_ids[d] = self.ids[t]
+
+        self.missed[~matched_tracks] += 1
+
+        # Unmatched confident detections start new tracks
+        new = usable[~matched_dets[usable]]
+        if len(new):
+            new_ids = np.arange(self.next_id, self.next_id + len(new))
+            self.next_id += len(new)
+            track_ids[new] = new_ids
+            self.ids = np.concatenate([self.ids, new_ids])
+            self.boxes = np.concatenate([self.boxes, boxes[new]])
+            self.missed = np.concatenate([self.missed, np.zeros(len(new), dtype=np.int64)])
+            self.committed = np.concatenate([self.committed, np.zeros(len(new), dtype=bool)])
+            self.votes.extend({int(class_ids[d]): 1} for d in new)
+
+        confirmed = []
+        for t in np.flatnonzero(~self.committed & (self.missed == 0)):
+            class_id, seen = max(self.votes[t].items(), key=lambda kv: kv[1])
+            if seen >= self.confirm_frames:
+                self.committed[t] = True
+                confirmed.append((int(self.ids[t]), int(class_id)))
+
+        # Forget tracks that have been out of view too long
+        keep = self.missed <= self.max_missed
+        if not keep.all():
+            self.ids = self.ids[keep]
+            self.boxes = self.boxes[keep]
+            self.missed = self.missed[keep]
+            self.committed = self.committed[keep]
+            self.votes = [v for v, k in zip(self.votes, keep) if k]
+
+        return track_ids, confirmed